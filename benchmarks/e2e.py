@@ -0,0 +1,239 @@
+# Сквозной бенчмарк: сколько камер выдерживает один сервер
+# python -m benchmarks.e2e --max-cameras 64 --duration 20 --output report.json [--gui]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+from PyQt6.QtCore import QEventLoop, QTimer
+
+from benchmarks.micro import machine_info, synthetic_matrix
+from controllers.procstat import CpuSampler, rss_bytes
+from mocks.loadgen import encode_sequence, make_handler
+
+BASE_PORT = 8300
+WARMUP_SECONDS = 3
+MIN_FPS_RATIO = 0.9  # ниже этой доли целевого fps считаем, что сервер не справляется
+SAMPLE_INTERVAL_MS = 1000
+
+
+class SyntheticSource:
+    """Local MJPEG endpoint for one benchmark camera"""
+
+    def __init__(self, device_id: str, port: int, frames: list[bytes], fps: float):
+        self.device_id = device_id
+        self.port = port
+        self.frames_sent = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self, frames, fps))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    data = np.array(values) * 1000
+    return {"p50": float(np.percentile(data, 50)), "p90": float(np.percentile(data, 90)),
+            "p99": float(np.percentile(data, 99)), "max": float(data.max()), "count": len(data)}
+
+
+def wait(seconds: float):
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec()
+
+
+class Harness:
+    def __init__(self, args):
+        from controllers.controller import DeviceManager
+        from controllers.replay import OfflineMqtt
+        from models.model import Esp32Manager
+
+        self.args = args
+        self.model = Esp32Manager()
+        self.mqtt = OfflineMqtt()
+        self.manager = DeviceManager(self.model, self.mqtt)
+        self.view = None
+        if args.gui:
+            from controllers.controller import GuiController
+            from views.view import MainWindow
+            self.view = MainWindow()
+            self.gui = GuiController(self.model, self.view, self.manager)
+            self.view.show()
+
+        width, height = map(int, args.resolution.split("x"))
+        self.frames = encode_sequence(50, width, height, args.quality)
+        self.sources: list[SyntheticSource] = []
+        self.overlays: dict[str, int] = {}
+        self.latencies: list[float] = []
+        self.processor_pid = os.getpid()
+        self.cpu = CpuSampler()
+        self.cpu_samples: list[dict[int, float]] = []
+        self.rss_samples: list[dict[int, int]] = []
+
+        processor = self.manager.processor
+        processor.overlay_ready.connect(self._on_overlay)
+        processor.frame_latency.connect(self._on_latency)
+
+        self.matrix_payload = synthetic_matrix().astype("<f4").tobytes()
+        self.matrix_timer = QTimer()
+        self.matrix_timer.timeout.connect(self._publish_matrices)
+        self.matrix_timer.start(int(1000 / args.matrix_rate))
+        self.sample_timer = QTimer()
+        self.sample_timer.timeout.connect(self._sample_processes)
+
+    def _on_overlay(self, device_id, frame, captured):
+        self.overlays[device_id] = self.overlays.get(device_id, 0) + 1
+
+    def _on_latency(self, device_id, latency):
+        self.latencies.append(latency)
+
+    def _publish_matrices(self):
+        for source in self.sources:
+            self.manager.handle_mqtt(f"{source.device_id}/amg8833", self.matrix_payload)
+
+    def _pids(self) -> list[int]:
+        return [os.getpid()] + [process.pid for process, _, _ in self.manager.streams.workers.values() if process.pid]
+
+    def _sample_processes(self):
+        pids = self._pids()
+        usage = self.cpu.sample(pids)
+        if usage:
+            self.cpu_samples.append(usage)
+        self.rss_samples.append({pid: rss_bytes(pid) or 0 for pid in pids})
+
+    def add_camera(self):
+        index = len(self.sources)
+        source = SyntheticSource(f"e2e{index:03d}", self.args.base_port + index, self.frames, self.args.fps)
+        self.sources.append(source)
+        # Те же сообщения, что прислала бы камера: discovery, затем статус active запускает поток
+        self.manager.handle_mqtt("discovery", f"{source.device_id}:127.0.0.1:{source.port}".encode())
+        self.manager.handle_mqtt(f"{source.device_id}/status", b"active")
+        if self.view:
+            self.view.add_camera_widget(source.device_id, f"Cam-{source.device_id}")
+
+    def _counters(self) -> tuple[dict, dict]:
+        streams = self.manager.streams
+        return dict(self.overlays), {device_id: dict(stats) for device_id, stats in streams.stats.items()}
+
+    def run_step(self, cameras: int) -> dict:
+        while len(self.sources) < cameras:
+            self.add_camera()
+        wait(WARMUP_SECONDS)
+
+        overlays_before, stats_before = self._counters()
+        self.latencies = []
+        self.cpu_samples, self.rss_samples = [], []
+        self.cpu.sample(self._pids())
+        self.sample_timer.start(SAMPLE_INTERVAL_MS)
+        started = time.monotonic()
+        wait(self.args.duration)
+        elapsed = time.monotonic() - started
+        self.sample_timer.stop()
+        overlays_after, stats_after = self._counters()
+
+        fps = [(overlays_after.get(s.device_id, 0) - overlays_before.get(s.device_id, 0)) / elapsed
+               for s in self.sources]
+
+        def delta(key):
+            return sum(stats.get(key, 0) - stats_before.get(device_id, {}).get(key, 0)
+                       for device_id, stats in stats_after.items())
+
+        worker_cpu = [sum(u for pid, u in sample.items() if pid != self.processor_pid) for sample in self.cpu_samples]
+        main_cpu = [sample.get(self.processor_pid, 0) for sample in self.cpu_samples]
+        worker_rss = [sum(r for pid, r in sample.items() if pid != self.processor_pid) for sample in self.rss_samples]
+        main_rss = [sample.get(self.processor_pid, 0) for sample in self.rss_samples]
+        return {
+            "cameras": cameras,
+            "duration": elapsed,
+            "fps": {"target": self.args.fps, "mean": float(np.mean(fps)), "min": float(np.min(fps)),
+                    "total": float(np.sum(fps))},
+            "latency_ms": percentiles(self.latencies),
+            "frames": {"read": delta("read"), "decoded": delta("decoded"), "dropped_worker": delta("dropped"),
+                       "processed": int(sum(fps) * elapsed)},
+            "cpu": {"main": float(np.mean(main_cpu)) if main_cpu else None,
+                    "workers_total": float(np.mean(worker_cpu)) if worker_cpu else None,
+                    "per_worker": float(np.mean(worker_cpu)) / cameras if worker_cpu else None},
+            "rss_mb": {"main": max(main_rss, default=0) / 2 ** 20,
+                       "workers_total": max(worker_rss, default=0) / 2 ** 20},
+        }
+
+    def close(self):
+        self.manager.stop_all()
+        self.manager.processing_thread.quit()
+        self.manager.processing_thread.wait()
+        for source in self.sources:
+            source.close()
+
+
+def ramp(max_cameras: int, start: int, factor: float) -> list[int]:
+    steps, count = [], start
+    while count < max_cameras:
+        steps.append(count)
+        count = max(count + 1, int(count * factor))
+    steps.append(max_cameras)
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end camera capacity benchmark")
+    parser.add_argument("--max-cameras", type=int, default=32)
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--factor", type=float, default=2, help="множитель числа камер между шагами")
+    parser.add_argument("--duration", type=float, default=15, help="секунд измерения на шаг")
+    parser.add_argument("--fps", type=float, default=25)
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--matrix-rate", type=float, default=2)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--gui", action="store_true", help="запускать с окном и виджетами камер")
+    parser.add_argument("--keep-going", action="store_true", help="не останавливать рост после насыщения")
+    parser.add_argument("--output", help="JSON отчет")
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    if args.gui:
+        from PyQt6.QtWidgets import QApplication
+        app = QApplication(sys.argv[:1])
+    else:
+        from PyQt6.QtCore import QCoreApplication
+        app = QCoreApplication(sys.argv[:1])
+
+    # История, свертки и журнал сервера пишутся в текущий каталог
+    os.chdir(tempfile.mkdtemp(prefix="thermo-e2e-"))
+    harness = Harness(args)
+    report = {"machine": machine_info(), "created": time.time(), "config": vars(args), "steps": []}
+    try:
+        for cameras in ramp(args.max_cameras, args.start, args.factor):
+            step = harness.run_step(cameras)
+            report["steps"].append(step)
+            latency = step["latency_ms"]
+            print(f"[E2E] {cameras:4d} cameras: {step['fps']['mean']:5.1f} fps/cam (min {step['fps']['min']:.1f}), "
+                  f"p50 {latency.get('p50', 0):.0f} ms, p99 {latency.get('p99', 0):.0f} ms, "
+                  f"dropped {step['frames']['dropped_worker']}, main CPU {step['cpu']['main'] or 0:.2f}")
+            if step["fps"]["mean"] < args.fps * MIN_FPS_RATIO and not args.keep_going:
+                break
+    finally:
+        harness.close()
+
+    sustained = [step["cameras"] for step in report["steps"] if step["fps"]["mean"] >= args.fps * MIN_FPS_RATIO]
+    report["sustained_cameras"] = max(sustained, default=0)
+    print(f"[E2E] sustained {report['sustained_cameras']} cameras at >= {MIN_FPS_RATIO:.0%} of {args.fps} fps")
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
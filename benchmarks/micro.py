@@ -0,0 +1,282 @@
+# Микро-бенчмарки горячих путей с порогом регрессии относительно сохранённых базовых значений
+# python -m benchmarks.micro                 сравнить с benchmarks/baselines.json
+# python -m benchmarks.micro --update        записать новые базовые значения
+# python -m benchmarks.micro -k handle_frame только бенчмарки, содержащие подстроку
+# python -m benchmarks.micro --allow-missing не падать без базовых значений (локальный прогон)
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PyQt6.QtCore import QCoreApplication, QPointF, Qt
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_TOLERANCE = 0.25  # допустимое замедление относительно базового значения
+MIN_RUN_TIME = 0.2  # секунды на один замер
+REPEATS = 5
+FRAME_SIZE = (640, 480)
+
+OVERLAY_MODES = ("both", "video", "thermal")
+VIDEO_FILTERS = ("none", "gray", "edges")
+ZONE_COUNTS = (1, 10, 100)
+DEVICE_COUNTS = (10, 1000)
+MQTT_BATCHES = (1, 32)
+
+BENCHMARKS = {}
+TEARDOWNS = []
+
+
+def benchmark(name: str):
+    """Registers a setup function that returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def measure(fn, min_time: float = MIN_RUN_TIME, repeats: int = REPEATS) -> dict:
+    # Подбираем число вызовов так, чтобы замер длился не меньше min_time
+    fn()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10:
+            break
+        number *= 10
+    number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(samples), "min": min(samples), "max": max(samples), "number": number}
+
+
+def synthetic_matrix(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (25 + 10 * rng.random((8, 8))).astype(np.float32)
+
+
+def synthetic_frame() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 256, (FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+
+
+def synthetic_zones(count: int, kind: str):
+    from models.model import AlertZone
+    rng = np.random.default_rng(count)
+    zones = []
+    for x, y in rng.random((count, 2)) * 0.8:
+        if kind == "point":
+            coords = [QPointF(x, y)]
+        else:
+            coords = [QPointF(x, y), QPointF(x + 0.15, y), QPointF(x + 0.15, y + 0.15), QPointF(x, y + 0.15)]
+        zones.append(AlertZone(type=kind, coords=coords, threshold=30))
+    return zones
+
+
+def make_model(device_count: int = 1, zones=None):
+    from models.model import Esp32Device, Esp32Manager, DeviceState
+    model = Esp32Manager()
+    for i in range(device_count):
+        device = Esp32Device(id=f"bench{i:04d}", state=DeviceState.ACTIVE)
+        if zones is not None:
+            device.alert_zones = list(zones)
+        model.add_device(device)
+    return model
+
+
+def make_processor(model):
+    from controllers.video import ProcessingController
+    processor = ProcessingController(model)
+    for device in model.get_all():
+        processor.update_matrix(device.id, synthetic_matrix())
+    return processor
+
+
+def _register_handle_frame(mode, video_filter, colormap):
+    @benchmark(f"handle_frame[{mode}-{video_filter}-{colormap}]")
+    def setup():
+        from models.model import ProcessingSettings
+        model = make_model()
+        device = model.get_all()[0]
+        device.processing_settings = ProcessingSettings(overlay_mode=mode, video_filter=video_filter,
+                                                        heatmap_colormap=colormap)
+        processor = make_processor(model)
+        frame = synthetic_frame()
+        return lambda: processor.handle_frame(device.id, frame)
+
+
+def _register_update_temperature(count, kind):
+    @benchmark(f"update_temperature[{count}-{kind}]")
+    def setup():
+        model = make_model(zones=synthetic_zones(count, kind))
+        processor = make_processor(model)
+        device_id = model.get_all()[0].id
+        matrix = synthetic_matrix()
+        return lambda: processor.update_temperature(device_id, matrix)
+
+
+def _register_handle_mqtt(batch):
+    @benchmark(f"handle_mqtt_amg8833[batch={batch}]")
+    def setup():
+        from controllers.controller import DeviceManager
+        from controllers.replay import OfflineMqtt
+        model = make_model(batch)
+        manager = DeviceManager(model, OfflineMqtt())
+        # Пачка обычно уходит в поток обработки; здесь меряем весь путь синхронно
+        manager.matrices_ready.disconnect()
+        manager.matrices_ready.connect(manager.processor.update_matrices, Qt.ConnectionType.DirectConnection)
+        TEARDOWNS.append(lambda: (manager.stop_all(), manager.processing_thread.quit(),
+                                  manager.processing_thread.wait()))
+        messages = [(f"{device.id}/amg8833", synthetic_matrix(i).astype("<f4").tobytes())
+                    for i, device in enumerate(model.get_all())]
+
+        def run():
+            # Сообщения одного прохода цикла событий копятся и разбираются пачкой в _flush_matrices
+            for topic, payload in messages:
+                manager.handle_mqtt(topic, payload)
+            manager._flush_matrices()
+        return run
+
+
+def _register_devices_io(count):
+    @benchmark(f"save_devices[{count}]")
+    def setup_save():
+        model = make_model(count, synthetic_zones(3, "area"))
+        return model.save_devices
+
+    @benchmark(f"load_devices[{count}]")
+    def setup_load():
+        from models.model import Esp32Manager
+        make_model(count, synthetic_zones(3, "area")).save_devices()
+        return Esp32Manager.load_devices
+
+
+@benchmark("create_heatmap")
+def setup_create_heatmap():
+    from controllers.pipeline import ProcessingPipeline
+    from models.model import ProcessingSettings
+    pipeline = ProcessingPipeline(ProcessingSettings())
+    frame = synthetic_frame()
+    pipeline.process(frame, synthetic_matrix())
+    matrix = synthetic_matrix()
+    return lambda: pipeline.create_heatmap(matrix, pipeline.heatmap)
+
+
+def _register_all():
+    from controllers.pipeline import COLORMAPS
+    for mode, video_filter, colormap in itertools.product(OVERLAY_MODES, VIDEO_FILTERS, COLORMAPS):
+        _register_handle_frame(mode, video_filter, colormap)
+    for count, kind in itertools.product(ZONE_COUNTS, ("point", "area")):
+        _register_update_temperature(count, kind)
+    for batch in MQTT_BATCHES:
+        _register_handle_mqtt(batch)
+    for count in DEVICE_COUNTS:
+        _register_devices_io(count)
+
+
+def machine_info() -> dict:
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "processor": platform.processor(), "cpus": os.cpu_count()}
+
+
+def load_baselines(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> tuple[list[str], list[str]]:
+    """Returns (regressions, benchmarks without a baseline)"""
+    regressions = []
+    missing = []
+    for name, result in results.items():
+        baseline = baselines.get("results", {}).get(name)
+        if not baseline:
+            missing.append(name)
+        elif result["median"] > baseline["median"] * (1 + tolerance):
+            regressions.append(name)
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot path micro-benchmarks")
+    parser.add_argument("-k", dest="filter", default="", help="запускать только бенчмарки с подстрокой")
+    parser.add_argument("--baselines", default=BASELINES_FILE)
+    parser.add_argument("--update", action="store_true", help="сохранить результаты как базовые")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-time", type=float, default=MIN_RUN_TIME)
+    parser.add_argument("--output", help="записать результаты прогона в JSON")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="не считать ошибкой отсутствие базовых значений")
+    args = parser.parse_args()
+    baselines_path = os.path.abspath(args.baselines)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    app = QCoreApplication(sys.argv[:1])
+    _register_all()
+    baselines = load_baselines(baselines_path)
+    if not baselines and not args.update:
+        print(f"[BENCH] no baselines at {baselines_path}, record them with --update")
+
+    # История, свертки и журнал пишутся в текущий каталог - уводим их во временный
+    workdir = tempfile.mkdtemp(prefix="thermo-bench-")
+    os.chdir(workdir)
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        result = measure(setup(), args.min_time)
+        results[name] = result
+        baseline = baselines.get("results", {}).get(name)
+        delta = f"{(result['median'] / baseline['median'] - 1) * 100:+6.1f}%" if baseline else "   new"
+        print(f"{name:48s} {result['median'] * 1e6:10.1f} us  {delta}")
+
+    for teardown in TEARDOWNS:
+        teardown()
+
+    report = {"machine": machine_info(), "created": time.time(), "tolerance": args.tolerance, "results": results}
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update:
+        # Обновляем только прогнанные бенчмарки, остальные базовые значения сохраняются
+        merged = {**baselines.get("results", {}), **results}
+        with open(baselines_path, "w") as f:
+            json.dump({**report, "results": merged}, f, indent=2)
+        print(f"[BENCH] baselines written to {baselines_path}")
+        return 0
+
+    if baselines and baselines.get("machine") != machine_info():
+        print("[BENCH] baselines were recorded on a different machine, comparison is indicative only")
+    regressions, missing = compare(results, baselines, args.tolerance)
+    for name in regressions:
+        print(f"[BENCH] regression: {name} slower than baseline by more than {args.tolerance:.0%}")
+    for name in missing:
+        print(f"[BENCH] missing baseline: {name}")
+    # Без базового значения бенчмарк ничего не проверяет - это ошибка, а не молчаливый пропуск
+    if missing and not args.allow_missing:
+        print(f"[BENCH] {len(missing)} benchmarks have no baseline, run with --update or --allow-missing")
+        return 1
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
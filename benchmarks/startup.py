@@ -0,0 +1,79 @@
+# Бенчмарк запуска: время до показа окна и до готовности сервисов
+# python -m benchmarks.startup --runs 5 --output startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.micro import machine_info
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_TIMEOUT = 60
+MARKERS = {"[STARTUP] window shown": "first_paint", "[STARTUP] services ready": "ready"}
+
+
+def empty_session(directory: str) -> str:
+    from controllers.replay import SessionCapture
+    # Пустая записанная сессия: сервер стартует полностью, но без брокера и камер
+    path = os.path.join(directory, "session")
+    SessionCapture(path).close()
+    return path
+
+
+def run_once(workdir: str, session: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    command = [sys.executable, os.path.join(REPO_ROOT, "main.py"),
+               "--replay", session, "--speed", "0", "--exit-after-startup"]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    result = {}
+    for line in process.stdout:
+        for marker, name in MARKERS.items():
+            if line.startswith(marker):
+                result[name] = (time.perf_counter() - started) * 1000
+                result[f"{name}_cv2_loaded"] = line.rstrip().endswith("True")
+    process.wait(timeout=RUN_TIMEOUT)
+    result["exit"] = (time.perf_counter() - started) * 1000
+    result["returncode"] = process.returncode
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="JSON отчет")
+    args = parser.parse_args()
+
+    # Настройки камер, история и журнал пишутся в рабочий каталог - берем временный
+    workdir = tempfile.mkdtemp(prefix="thermo-startup-")
+    session = empty_session(workdir)
+    runs = []
+    for index in range(args.runs):
+        result = run_once(workdir, session)
+        runs.append(result)
+        print(f"[STARTUP] run {index + 1}: first paint {result.get('first_paint', 0):.0f} ms, "
+              f"ready {result.get('ready', 0):.0f} ms, cv2 before paint {result.get('first_paint_cv2_loaded')}")
+
+    report = {"machine": machine_info(), "created": time.time(), "runs": runs}
+    for name in MARKERS.values():
+        values = [run[name] for run in runs if name in run]
+        if values:
+            report[name] = {"median_ms": statistics.median(values), "min_ms": min(values), "max_ms": max(values)}
+    print(f"[STARTUP] median first paint {report.get('first_paint', {}).get('median_ms', 0):.0f} ms, "
+          f"ready {report.get('ready', {}).get('median_ms', 0):.0f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
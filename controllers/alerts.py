@@ -0,0 +1,146 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from models.model import AlertZone
+
+ALERT_RAISED = "raised"
+ALERT_CLEARED = "cleared"
+
+
+@dataclass
+class AlertEvent:
+    device_id: str
+    zone_index: int  # индекс среди включенных зон устройства
+    zone_type: str
+    state: str  # ALERT_RAISED / ALERT_CLEARED
+    temperature: float
+    threshold: float
+    timestamp: float
+    latency: float = 0  # от прихода MQTT-сообщения до события, секунды
+
+
+class AlertEngine(QObject):
+    """Threshold evaluation of all zones of all devices over flat per-zone arrays"""
+    alert_raised = pyqtSignal(object)  # AlertEvent
+    alert_cleared = pyqtSignal(object)  # AlertEvent
+
+    def __init__(self):
+        super().__init__()
+        self.zones: dict[str, list[AlertZone]] = {}
+        self.keys: list[tuple[str, int]] = []
+        self.device_rows: dict[str, np.ndarray] = {}
+        self._allocate(0)
+
+    def _allocate(self, size: int):
+        # Параметры зон
+        self.threshold = np.zeros(size, dtype=np.float32)
+        self.hysteresis = np.zeros(size, dtype=np.float32)
+        self.min_duration = np.zeros(size, dtype=np.float64)
+        self.rate_limit = np.zeros(size, dtype=np.float64)
+        # Состояние
+        self.values = np.full(size, np.nan, dtype=np.float32)
+        self.received = np.zeros(size, dtype=np.float64)
+        self.active = np.zeros(size, dtype=bool)
+        self.raise_pending_since = np.full(size, np.nan, dtype=np.float64)
+        self.clear_pending_since = np.full(size, np.nan, dtype=np.float64)
+        self.last_raised = np.full(size, -np.inf, dtype=np.float64)
+
+    STATE_ARRAYS = ("values", "received", "active", "raise_pending_since", "clear_pending_since", "last_raised")
+
+    def set_zones(self, device_id: str, zones: list[AlertZone]):
+        rows = self.device_rows.get(device_id)
+        if rows is not None:
+            # Зоны пересоздаются - снимаем активные тревоги устройства
+            now = time.time()
+            for row in rows[self.active[rows]]:
+                self._emit(row, ALERT_CLEARED, now, from_data=False)
+        self.zones[device_id] = [zone for zone in zones if zone.enabled]
+        self._rebuild(reset=device_id)
+
+    def remove_device(self, device_id: str):
+        if device_id in self.zones:
+            self.set_zones(device_id, [])
+            del self.zones[device_id]
+            self._rebuild()
+
+    def _rebuild(self, reset: str | None = None):
+        old_rows = {key: row for row, key in enumerate(self.keys)}
+        old_state = {name: getattr(self, name) for name in self.STATE_ARRAYS}
+
+        self.keys = [(device_id, index) for device_id, zones in self.zones.items() for index in range(len(zones))]
+        self._allocate(len(self.keys))
+        self.device_rows = {}
+        row = 0
+        for device_id, zones in self.zones.items():
+            self.device_rows[device_id] = np.arange(row, row + len(zones))
+            for zone in zones:
+                self.threshold[row] = zone.threshold
+                self.hysteresis[row] = zone.hysteresis
+                self.min_duration[row] = zone.min_duration
+                self.rate_limit[row] = zone.rate_limit
+                row += 1
+
+        kept = [(new_row, old_rows[key]) for new_row, key in enumerate(self.keys)
+                if key in old_rows and key[0] != reset]
+        if kept:
+            new_idx, old_idx = np.array(kept).T
+            for name, array in old_state.items():
+                getattr(self, name)[new_idx] = array[old_idx]
+
+    def update(self, device_id: str, temperatures, received: float):
+        rows = self.device_rows.get(device_id)
+        if rows is None or len(rows) != len(temperatures):
+            return
+        self.values[rows] = temperatures
+        self.received[rows] = received
+
+    def evaluate(self, now: float | None = None):
+        now = time.time() if now is None else now
+        values = self.values
+
+        above = values >= self.threshold
+        below = values < self.threshold - self.hysteresis
+
+        # Дребезг: условие должно держаться min_duration секунд
+        raising = ~self.active & above
+        self.raise_pending_since = np.where(raising, np.fmin(self.raise_pending_since, now), np.nan)
+        clearing = self.active & below
+        self.clear_pending_since = np.where(clearing, np.fmin(self.clear_pending_since, now), np.nan)
+
+        raised = (raising & (now - self.raise_pending_since >= self.min_duration)
+                  & (now - self.last_raised >= self.rate_limit))
+        cleared = clearing & (now - self.clear_pending_since >= self.min_duration)
+
+        if not (raised.any() or cleared.any()):
+            return
+
+        self.active |= raised
+        self.active &= ~cleared
+        self.last_raised[raised] = now
+        self.raise_pending_since[raised] = np.nan
+        self.clear_pending_since[cleared] = np.nan
+
+        for row in np.flatnonzero(raised):
+            self._emit(row, ALERT_RAISED, now)
+        for row in np.flatnonzero(cleared):
+            self._emit(row, ALERT_CLEARED, now)
+
+    def active_alerts(self, device_id: str) -> list[int]:
+        rows = self.device_rows.get(device_id)
+        if rows is None:
+            return []
+        return np.flatnonzero(self.active[rows]).tolist()
+
+    def _emit(self, row: int, state: str, now: float, from_data: bool = True):
+        device_id, index = self.keys[row]
+        zone = self.zones[device_id][index]
+        event = AlertEvent(device_id=device_id, zone_index=index, zone_type=zone.type, state=state,
+                           temperature=float(self.values[row]), threshold=float(self.threshold[row]),
+                           timestamp=now, latency=float(now - self.received[row]) if from_data else 0)
+        if state == ALERT_RAISED:
+            self.alert_raised.emit(event)
+        else:
+            self.alert_cleared.emit(event)
@@ -6,18 +6,30 @@ from views.view import SettingsView, WidgetAlertZone, AlertZoneDTO
 from models.model import Esp32Device, Esp32Manager, AlertZone, ProcessingSettings, DeviceState
 from views.view import MainWindow
 from PyQt6.QtWidgets import (QMessageBox, QDialog)
-from PyQt6.QtCore import Qt, QObject, pyqtSignal, QTimer, QThread
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QTimer, QThread, QCoreApplication, QEvent
 from controllers.network import MqttController
 from controllers.video import  ProcessingController,VideoProcessController,VideoProcessWorker
-import struct
+from controllers.scheduler import FrameRateScheduler
+from controllers.supervisor import StreamSupervisor
+from controllers.alerts import AlertEvent, ALERT_RAISED
+from models.journal import EventJournal
+from controllers import instrumentation
+from controllers.tracing import ENABLED as TRACE_ENABLED, TRACE_COLLECT_MS, TRACER, span
+import numpy as np
+import time
 from dataclasses import asdict
 
+AMG8833_PAYLOAD_SIZE = 64 * 4
+
 
 
 class DeviceManager(QObject):
     request_start = pyqtSignal(str)
     request_ack = pyqtSignal(str)
     request_stop = pyqtSignal(str)
+    # Состоянием обработки (хранилище, тревоги) владеет только поток обработки - пачки уходят туда сигналом
+    matrices_ready = pyqtSignal(list, object, float)  # device_ids, [B, 8, 8] matrices, received
+    device_released = pyqtSignal(str)
     def __init__(self, model: Esp32Manager, mqtt_client:MqttController):
         super().__init__()
         self.model = model
@@ -35,6 +47,13 @@ class DeviceManager(QObject):
 
         #connect ready
         self.streams.frame_ready.connect(self.processor.handle_frame)
+        self.matrices_ready.connect(self.processor.update_matrices)
+        self.device_released.connect(self.processor.release_device)
+
+        # Frame-rate scheduling
+        self.scheduler = FrameRateScheduler()
+        self.processor.frame_processed.connect(self.scheduler.report_frame)
+        self.scheduler.framerate_changed.connect(self.streams.set_framerate)
 
         # Handle activation
         #self.connection.device_activated.connect(self._on_device_activated)
@@ -42,29 +61,100 @@ class DeviceManager(QObject):
         #self.connection.device_disconnected.connect(self._on_device_disconnected)
 
         # MQTT send commands
-        self.request_start.connect(lambda id: self.mqtt.publish(f"{id}/control", "start"))
-        self.request_stop.connect(lambda id: self.mqtt.publish(f"{id}/control", "stop"))
-        self.request_ack.connect(lambda id: self.mqtt.publish(f"{id}/control", "ack-connect"))
-
+        self.request_start.connect(lambda id: self.mqtt.publish(f"{id}/control", "start", 1))
+        self.request_stop.connect(lambda id: self.mqtt.publish(f"{id}/control", "stop", 1))
+        self.request_ack.connect(lambda id: self.mqtt.publish(f"{id}/control", "ack-connect", 1))
+
+        # Матрицы, пришедшие за один проход цикла событий, обрабатываются пачкой
+        self._pending_matrix_ids: list[str] = []
+        self._pending_matrix_payloads: list[bytes] = []
+        self._pending_matrix_received = 0.0
+        self.rejected_payloads = 0
+        self.alert_counts: dict[tuple[str, str], int] = {}  # (device_id, state) -> count
+
+        self.processor.alerts.alert_raised.connect(self._on_alert)
+        self.processor.alerts.alert_cleared.connect(self._on_alert)
+
+        # Журнал тревог и событий
+        self.journal = EventJournal()
+        self.journal.start()
+        self.streams.event_received.connect(self._on_stream_event)
+
+        # Перезапуск упавших и зависших воркеров
+        self.supervisor = StreamSupervisor(self.streams)
+        self.supervisor.worker_restarted.connect(self._on_worker_restarted)
+        self.supervisor.device_failed.connect(self._on_device_failed)
+        self.supervisor.device_recovered.connect(self._on_device_recovered)
+
+        # Камеры, бывшие на экране при прошлом запуске, стартуют сразу после обнаружения
+        self.streams.reserve(len(self.restored_devices()))
 
     def handle_mqtt(self, topic: str, payload: bytes):
+        with span("mqtt_dispatch", topic=topic):
+            if topic == "discovery":
+                self.handle_discovery(payload.decode())
+            elif topic.endswith("/status"):
+                device_id = topic.split("/")[0]
+                self.handle_status(device_id, payload.decode())
+                print(device_id,payload.decode())
+            elif topic.endswith("/amg8833"):
+                if len(payload) != AMG8833_PAYLOAD_SIZE:
+                    self.rejected_payloads += 1
+                    return
+                if not self._pending_matrix_ids:
+                    self._pending_matrix_received = time.time()
+                    QTimer.singleShot(0, self._flush_matrices)
+                self._pending_matrix_ids.append(topic.split("/")[0])
+                self._pending_matrix_payloads.append(payload)
+
+    def _flush_matrices(self):
+        device_ids, payloads = self._pending_matrix_ids, self._pending_matrix_payloads
+        self._pending_matrix_ids, self._pending_matrix_payloads = [], []
+        if not device_ids:
+            return
+        matrices = np.frombuffer(b"".join(payloads), dtype="<f4").reshape(len(device_ids), 8, 8)
+        self.matrices_ready.emit(device_ids, matrices, self._pending_matrix_received)
+        # Матрицы нужны воркеру для клипов событий
+        for device_id, matrix in zip(device_ids, matrices):
+            self.streams.update_matrix(device_id, matrix, self._pending_matrix_received)
+
+    def _on_alert(self, event: AlertEvent):
+        print(f"[ALERT] {event.device_id} zone {event.zone_index} {event.state}: "
+              f"{event.temperature:.1f}°C / {event.threshold:.1f}°C ({event.latency * 1000:.0f} ms)")
+        key = (event.device_id, event.state)
+        self.alert_counts[key] = self.alert_counts.get(key, 0) + 1
+        self.mqtt.publish_alert(event)
+        if event.state == ALERT_RAISED:
+            self.streams.record_clip(event.device_id)
+        data = asdict(event)
+        self.journal.record("alert", data.pop("device_id"), **data)
+
+    def _on_stream_event(self, device_id: str, event: str, msg: str):
+        if event == "error":
+            print(f"[STREAM] {device_id} error: {msg}")
+        self.journal.record("stream", device_id, event=event, msg=msg)
+
+    def _on_worker_restarted(self, device_id: str, attempt: int, reason: str):
+        self.journal.record("restart", device_id, attempt=attempt, reason=reason)
+
+    def _on_device_failed(self, device_id: str, reason: str):
+        device = self.model.get_device(device_id)
+        if device and device.state == DeviceState.ACTIVE:
+            print(f"[STREAM] {device_id} failed: {reason}")
+            device.state = DeviceState.ERROR
+            self.journal.record("status", device_id, status="error", previous="ACTIVE", msg=reason)
 
-        if topic == "discovery":
-            self.handle_discovery(payload.decode())
-        elif topic.endswith("/status"):
-            device_id = topic.split("/")[0]
-            self.handle_status(device_id, payload.decode())
-            print(device_id,payload.decode())
-        elif topic.endswith("/amg8833"):
-            device_id = topic.split("/")[0]
-            floats = struct.unpack('<64f', payload)
-            matrix = [floats[i * 8:(i + 1) * 8] for i in range(8)]
-            self.processor.update_matrix(device_id, matrix)
+    def _on_device_recovered(self, device_id: str):
+        device = self.model.get_device(device_id)
+        if device and device.state == DeviceState.ERROR:
+            device.state = DeviceState.ACTIVE
+            self.journal.record("status", device_id, status="recovered", previous="ERROR")
 
     def handle_status(self, device_id: str, status: str):
         device = self.model.get_device(device_id)
         if not device:
             return
+        self.journal.record("status", device_id, status=status, previous=str(device.state))
 
         prev_active = device.active
 
@@ -83,7 +173,8 @@ class DeviceManager(QObject):
             self._on_device_disconnected(device_id)
     def handle_discovery(self,payload : str):
         print(payload)
-        device_id, ip = payload.split(":")
+        # "id:ip" от камер или "id:ip:port" от генератора нагрузки
+        device_id, ip = payload.split(":", 1)
         device = self.model.get_device(device_id)
         if not device :
             device = Esp32Device(id=device_id, ip=ip, name=f"Camera-{device_id}", state=DeviceState.AVAILABLE)
@@ -96,6 +187,8 @@ class DeviceManager(QObject):
         self.mqtt.subscribe(f"{device_id}/status",1)
         self.mqtt.subscribe(f"{device_id}/amg8833")
         self.request_ack.emit(device_id)
+        if device.active:
+            self.start_device(device_id)
 
 
     def _on_device_activated(self, device_id: str):
@@ -103,19 +196,44 @@ class DeviceManager(QObject):
         self.processor.processing_settings_changed.emit(device_id, asdict(device.processing_settings))
         if device:
             self.streams.start_stream(device.id, device.ip)
+            self.scheduler.add_stream(device.id)
 
     def _on_device_deactivated(self, device_id: str):
         self.streams.stop_stream(device_id)
+        self.scheduler.remove_stream(device_id)
 
 
 
     def _on_device_disconnected(self, device_id: str):
         self.streams.stop_stream(device_id)
+        self.scheduler.remove_stream(device_id)
+        self.device_released.emit(device_id)
         self.model.save_devices()
 
 
     def stop_all(self):
+        self.supervisor.stop()
         self.streams.stop_all_streams()
+        # Хранилища принадлежат потоку обработки - сбрасываем их на диск, когда он остановлен
+        self.processing_thread.quit()
+        self.processing_thread.wait()
+        # Тревоги, поднятые при остановке, ждут в очереди главного потока - доставляем до сброса журнала
+        QCoreApplication.sendPostedEvents(self, QEvent.Type.MetaCall)
+        self.processor.history.flush()
+        self.processor.rollups.close()
+        self.journal.stop()
+        instrumentation.dump()
+
+    def dump_trace(self):
+        if not TRACE_ENABLED:
+            print("[TRACE] tracing is off, start with THERMO_TRACE=1")
+            return
+        # Воркеры присылают свои кольца через pipe, файл пишется после паузы на сбор
+        self.streams.request_traces()
+        QTimer.singleShot(TRACE_COLLECT_MS, lambda: print(f"[TRACE] written {TRACER.dump()}"))
+
+    def restored_devices(self) -> list[Esp32Device]:
+        return [device for device in self.model.get_all() if device.active]
 
     def start_device(self, device_id: str):
         self.request_start.emit(device_id)
@@ -137,11 +255,20 @@ class GuiController:
 
         self.view.request_editor.connect(self._open_alert_editor)
         self.view.request_camera_settings.connect(self._open_camera_settings)
+        self.view.expanded_camera_changed.connect(self.devices.scheduler.set_focused)
+        self.view.trace_requested.connect(self.devices.dump_trace)
 
         self.devices.processor.overlay_ready.connect(self.view.update_camera_frame)
         self.devices.processor.temperature_changed.connect(self.view.update_temperature_points)
         self.view.exit.connect(self.stop)
 
+        # Последний сохраненный кадр виден сразу, поток подменит его после переподключения
+        for device in self.devices.restored_devices():
+            self._show_camera(device.id)
+            thumbnail = self.devices.processor.thumbnails.load(device.id)
+            if thumbnail is not None:
+                self.view.update_camera_frame(device.id, thumbnail)
+
     def _handle_camera_click(self, camera_id):
         if self.view.expanded_camera_id == camera_id:
             QMessageBox.warning(
@@ -159,6 +286,7 @@ class GuiController:
         if confirm == QMessageBox.StandardButton.Yes:
             self.devices.stop_device(camera_id)
             self.model.disconnect_device(camera_id)
+            self.model.save_devices()
             self.view.remove_camera_widget(camera_id)
 
 
@@ -169,10 +297,13 @@ class GuiController:
             for device_id in dialog.get_selected():
                 self.model.get_device(device_id).active = True
                 self.devices.start_device(device_id)
-                self.view.add_camera_widget(device_id, f"Cam-{device_id}")
-                self.view.camera_widgets[device_id].set_zones(
-                    [AlertZoneDTO(**asdict(zone)) for zone in self.model.devices[device_id].alert_zones if zone.enabled] )
+                self._show_camera(device_id)
+            self.model.save_devices()
 
+    def _show_camera(self, device_id):
+        self.view.add_camera_widget(device_id, f"Cam-{device_id}")
+        self.view.camera_widgets[device_id].set_zones(
+            [AlertZoneDTO(**asdict(zone)) for zone in self.model.devices[device_id].alert_zones if zone.enabled] )
 
 
     def _open_settings(self):
@@ -188,11 +319,13 @@ class GuiController:
         settings_view.exec()
 
     def stop(self):
+        # Сначала останавливаем обработку: тревоги, поднятые при остановке, тоже должны уйти брокеру
+        self.devices.stop_all()
+
         self.devices.mqtt.publish("server/status","offline",1)
+        self.devices.mqtt.flush()
         #self.devices.mqtt.disconnect()
 
-        self.devices.stop_all()
-
     def _open_alert_editor(self,device_id):
         device = self.model.get_device(device_id)
         if device:
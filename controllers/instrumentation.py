@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Включается переменной окружения, выключенный таймер - пустой вызов метода
+ENABLED = os.environ.get("THERMO_PROFILE", "") not in ("", "0")
+PROFILE_DIR = "profiles"
+
+# Логарифмически-линейные корзины в духе HdrHistogram: 2^SUB_BITS значений на октаву, ~3% точности
+SUB_BITS = 5
+HALF = 1 << (SUB_BITS - 1)
+MAX_SHIFT = 40
+BUCKETS = (MAX_SHIFT + 2) * HALF
+UNIT = 1e-6  # значения хранятся в микросекундах
+
+
+def bucket_index(value: int) -> int:
+    if value < (1 << SUB_BITS):
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BITS
+    return (shift << (SUB_BITS - 1)) + (value >> shift)
+
+
+def bucket_values() -> np.ndarray:
+    """Lowest value (in units) represented by each bucket"""
+    indices = np.arange(BUCKETS)
+    shift = np.maximum(indices // HALF - 1, 0)
+    sub = np.where(indices < 2 * HALF, indices, indices - shift * HALF)
+    return sub.astype(np.float64) * (1 << shift)
+
+
+class LatencyHistogram:
+    """Single-writer histogram: only its owning thread records into it"""
+
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        index = bucket_index(int(seconds / UNIT))
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+
+class Registry:
+    """Per-thread histograms keyed by (stage, device); merged only when a report is requested"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # После fork воркер наследует таблицы родителя - начинаем с чистого реестра
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.tables: list[dict] = []
+        self.remote: dict[str, dict] = {}  # снимки из процессов воркеров, по источнику
+
+    def histogram(self, stage: str, device_id: str) -> LatencyHistogram:
+        table = getattr(self.local, "table", None)
+        if table is None:
+            table = self.local.table = {}
+            # Блокировка только при первом обращении потока, запись в гистограммы без неё
+            with self.lock:
+                self.tables.append(table)
+        histogram = table.get((stage, device_id))
+        if histogram is None:
+            histogram = table[(stage, device_id)] = LatencyHistogram()
+        return histogram
+
+    def record(self, stage: str, device_id: str, seconds: float):
+        self.histogram(stage, device_id).record(seconds)
+
+    def export(self) -> dict:
+        """Cumulative sparse counts of this process, small enough to send over a pipe"""
+        merged = {}
+        with self.lock:
+            tables = list(self.tables)
+        for table in tables:
+            for (stage, device_id), histogram in list(table.items()):
+                entry = merged.setdefault(f"{stage}|{device_id}", {"counts": {}, "total": 0.0, "max": 0.0})
+                for index, count in enumerate(histogram.counts):
+                    if count:
+                        entry["counts"][index] = entry["counts"].get(index, 0) + count
+                entry["total"] += histogram.total
+                entry["max"] = max(entry["max"], histogram.max)
+        return merged
+
+    def merge_remote(self, source: str, exported: dict):
+        # Снимки накопительные - последний заменяет предыдущий
+        self.remote[source] = exported
+
+    def report(self) -> dict:
+        combined: dict[str, dict] = {}
+        for exported in [self.export(), *self.remote.values()]:
+            for key, entry in exported.items():
+                target = combined.setdefault(key, {"counts": np.zeros(BUCKETS, dtype=np.int64), "total": 0.0, "max": 0.0})
+                for index, count in entry["counts"].items():
+                    target["counts"][int(index)] += count
+                target["total"] += entry["total"]
+                target["max"] = max(target["max"], entry["max"])
+
+        values = bucket_values() * UNIT
+        report = {}
+        for key, entry in sorted(combined.items()):
+            stage, device_id = key.split("|", 1)
+            counts = entry["counts"]
+            total = int(counts.sum())
+            if not total:
+                continue
+            cumulative = np.cumsum(counts)
+            quantile = {f"p{q}": float(values[np.searchsorted(cumulative, total * q / 100)]) * 1000
+                        for q in (50, 90, 99)}
+            report.setdefault(stage, {})[device_id] = {"count": total, "mean_ms": entry["total"] / total * 1000,
+                                                       "max_ms": entry["max"] * 1000, **{f"{k}_ms": v for k, v in quantile.items()}}
+        return report
+
+
+REGISTRY = Registry()
+
+
+class StageTimer:
+    """Records the time between consecutive laps as named stages of one frame"""
+
+    __slots__ = ("device_id", "last")
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        REGISTRY.record(stage, self.device_id, now - self.last)
+        self.last = now
+
+    def since(self, stage: str, ts: float):
+        if ts:
+            REGISTRY.record(stage, self.device_id, time.time() - ts)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage: str):
+        pass
+
+    def since(self, stage: str, ts: float):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def stage_timer(device_id: str) -> StageTimer | NullTimer:
+    return StageTimer(device_id) if ENABLED else NULL_TIMER
+
+
+def dump(directory: str = PROFILE_DIR) -> str | None:
+    if not ENABLED:
+        return None
+    report = REGISTRY.report()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"stages-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    for stage, devices in report.items():
+        count = sum(device["count"] for device in devices.values())
+        worst = max(device["p99_ms"] for device in devices.values())
+        print(f"[PROFILE] {stage:20s} n={count:8d}  worst p99 {worst:8.2f} ms")
+    return path
@@ -0,0 +1,153 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from controllers.procstat import cpu_seconds, rss_bytes
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+COLLECT_ATTEMPTS = 3
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsText:
+    """Prometheus text exposition format builder; samples of one family are kept together"""
+
+    def __init__(self):
+        self.families: dict[str, list[str]] = {}
+
+    def _family(self, name: str, kind: str, help_text: str) -> list[str]:
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        return family
+
+    def add(self, name: str, kind: str, help_text: str, value, **labels):
+        if value is None:
+            return
+        label_text = ",".join(f'{key}="{escape(val)}"' for key, val in labels.items())
+        sample = f"{name}{{{label_text}}}" if label_text else name
+        self._family(name, kind, help_text).append(f"{sample} {float(value)}")
+
+    def summary(self, name: str, help_text: str, total: float, count: int):
+        family = self._family(name, "summary", help_text)
+        family.append(f"{name}_sum {float(total)}")
+        family.append(f"{name}_count {float(count)}")
+
+    def render(self) -> bytes:
+        return ("\n".join(line for family in self.families.values() for line in family) + "\n").encode()
+
+
+class MetricsServer:
+    """Local /metrics endpoint; every value is read from counters the server already keeps"""
+
+    def __init__(self, device_manager, view=None, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.devices = device_manager
+        self.view = view
+        self.host = host
+        self.port = port
+        self.server: ThreadingHTTPServer | None = None
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                for _ in range(COLLECT_ATTEMPTS):
+                    try:
+                        body = metrics.collect().render()
+                        break
+                    except (RuntimeError, IndexError, ValueError):
+                        # Словарь изменился или массивы хранилища/тревог пересозданы другим потоком
+                        # во время обхода - просто повторяем
+                        continue
+                else:
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"[METRICS] http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def collect(self) -> MetricsText:
+        out = MetricsText()
+        streams = self.devices.streams
+        processor = self.devices.processor
+
+        # Кадры по этапам: received - прочитано воркером, decoded - отдано в очередь,
+        # polled - забрано из очереди, processed - наложение готово, displayed - показано
+        frames, frames_help = "thermo_frames_total", "Frames per camera and pipeline stage"
+        for device_id, stats in dict(streams.stats).items():
+            out.add(frames, "counter", frames_help, stats.get("read"),
+                    device=device_id, stage="received")
+            out.add(frames, "counter", frames_help, stats.get("decoded"), device=device_id, stage="decoded")
+            out.add("thermo_frame_drops_total", "counter", "Frames dropped per camera and queue",
+                    stats.get("dropped"), device=device_id, queue="worker_image_queue")
+        for device_id, count in dict(streams.polled).items():
+            out.add(frames, "counter", frames_help, count, device=device_id, stage="polled")
+        for device_id, count in dict(processor.processed).items():
+            out.add(frames, "counter", frames_help, count, device=device_id, stage="processed")
+        if self.view:
+            for device_id, widget in dict(self.view.camera_widgets).items():
+                out.add(frames, "counter", frames_help, widget.frames_displayed, device=device_id, stage="displayed")
+
+        for device_id, (process, image_queue, _) in dict(streams.workers).items():
+            out.add("thermo_worker_up", "gauge", "1 if the video worker process is alive",
+                    int(process.is_alive()), device=device_id)
+            if process.pid:
+                out.add("thermo_worker_rss_bytes", "gauge", "Resident memory of the video worker",
+                        rss_bytes(process.pid), device=device_id)
+                out.add("thermo_worker_cpu_seconds_total", "counter", "CPU time of the video worker",
+                        cpu_seconds(process.pid), device=device_id)
+        out.add("thermo_worker_pool_size", "gauge", "Warm video workers waiting for a camera", len(streams.pool))
+        for device_id, count in dict(self.devices.supervisor.restarts).items():
+            out.add("thermo_worker_restarts_total", "counter", "Video worker restarts by the supervisor",
+                    count, device=device_id)
+        for device_id, rate in self.devices.scheduler.stats().items():
+            out.add("thermo_target_fps", "gauge", "Frame rate assigned by the scheduler",
+                    rate["target_fps"], device=device_id)
+            out.add("thermo_processing_seconds", "gauge", "Smoothed processing time per frame",
+                    rate["processing_time"], device=device_id)
+
+        mqtt = self.devices.mqtt.stats()
+        out.add("thermo_mqtt_received_total", "counter", "MQTT messages received", mqtt["received"])
+        out.add("thermo_mqtt_published_total", "counter", "MQTT messages published", mqtt["published"])
+        out.add("thermo_mqtt_dropped_total", "counter", "Outbound MQTT messages dropped on a full queue",
+                mqtt["dropped"])
+        out.add("thermo_mqtt_backlog", "gauge", "Outbound MQTT queue length", mqtt["backlog"])
+        out.add("thermo_mqtt_backlog_max", "gauge", "Largest outbound MQTT queue length seen", mqtt["max_backlog"])
+        out.add("thermo_thermal_payloads_rejected_total", "counter", "AMG8833 payloads with a wrong size",
+                self.devices.rejected_payloads)
+
+        out.summary("thermo_zone_evaluation_seconds", "Time spent evaluating a device's alert zones",
+                    processor.zone_eval_seconds, processor.zone_eval_count)
+        for (device_id, state), count in dict(self.devices.alert_counts).items():
+            out.add("thermo_alerts_total", "counter", "Alert transitions", count, device=device_id, state=state)
+        for device_id in list(processor.alerts.zones):
+            out.add("thermo_alerts_active", "gauge", "Zones currently in alarm",
+                    len(processor.alerts.active_alerts(device_id)), device=device_id)
+
+        out.add("thermo_process_rss_bytes", "gauge", "Resident memory of the server process", rss_bytes("self"))
+        out.add("thermo_process_cpu_seconds_total", "counter", "CPU time of the server process", cpu_seconds("self"))
+        return out
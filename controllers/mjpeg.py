@@ -0,0 +1,69 @@
+import re
+import time
+import urllib.request
+
+MJPEG_CHUNK_SIZE = 16384
+MJPEG_TIMEOUT = 5
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+class MjpegStream:
+    """multipart/x-mixed-replace reader that yields raw JPEG bytes without decoding"""
+
+    def __init__(self, url: str, timeout: float = MJPEG_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.response = None
+        self.buffer = bytearray()
+
+    def open(self) -> bool:
+        self.buffer.clear()  # хвост предыдущего соединения к новому не относится
+        try:
+            self.response = urllib.request.urlopen(self.url, timeout=self.timeout)
+        except (OSError, ValueError):
+            self.response = None
+        return self.response is not None
+
+    def isOpened(self) -> bool:
+        return self.response is not None
+
+    def read(self) -> tuple[bytes, float] | None:
+        """Next (jpeg bytes, capture timestamp), None when the stream ended"""
+        while True:
+            frame = self._next_frame()
+            if frame is not None:
+                return frame, time.time()
+            try:
+                chunk = self.response.read1(MJPEG_CHUNK_SIZE)
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            self.buffer += chunk
+
+    def _next_frame(self) -> bytes | None:
+        start = self.buffer.find(SOI)
+        if start < 0:
+            # Заголовки части могут прийти раньше кадра - храним только хвост
+            del self.buffer[:max(len(self.buffer) - 1024, 0)]
+            return None
+        match = CONTENT_LENGTH.search(self.buffer, 0, start)
+        if match:
+            end = start + int(match.group(1))
+            if len(self.buffer) < end:
+                return None
+        else:
+            end = self.buffer.find(EOI, start + 2)
+            if end < 0:
+                return None
+            end += len(EOI)
+        frame = bytes(self.buffer[start:end])
+        del self.buffer[:end]
+        return frame
+
+    def release(self):
+        if self.response:
+            self.response.close()
+            self.response = None
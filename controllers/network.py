@@ -1,12 +1,24 @@
 
 from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
+import asyncio
 import socket
-import cv2
 import paho.mqtt.client as mqtt
 import threading
-from zeroconf import Zeroconf, ServiceBrowser, ServiceListener, ServiceInfo
+from zeroconf import ServiceInfo
+from zeroconf.asyncio import AsyncZeroconf
 import struct
 import time
+import json
+import queue
+from dataclasses import asdict
+
+from controllers.tracing import span
+from controllers.alerts import ALERT_RAISED
+
+OUTBOUND_QUEUE_MAXSIZE = 1000  # предел только для QoS 0; QoS 1+ (команды, статус) не отбрасываются
+ALERT_BATCH_INTERVAL = 0.05  # секунды, окно объединения всплеска тревог
+ALERTS_TOPIC = "server/alerts"
+
 
 class MqttController(QObject):
     mqtt_message_recieved = pyqtSignal(str,bytes) #topic, payload
@@ -22,15 +34,39 @@ class MqttController(QObject):
         self.discovery_topic = "discovery"
         self.mqtt_client: mqtt.Client | None = None
 
+        # Исходящие сообщения публикуются одним потоком; очередь общая, чтобы не менять порядок,
+        # а ограничено в ней только число сообщений QoS 0
+        self.outbound: queue.Queue = queue.Queue()
+        self.outbound_lock = threading.Lock()
+        self.best_effort_queued = 0
+        self.publisher_thread: threading.Thread | None = None
+        self.alerts_lock = threading.Lock()
+        self.pending_alerts: list = []
+        self.pending_alerts_since = 0.0
+        self.alerts_in_flight = 0
+        self.last_sent: mqtt.MQTTMessageInfo | None = None  # последнее сообщение, отданное paho
+        self.alarm_state: dict[str, dict[int, dict]] = {}  # device_id -> zone_index -> last raise event
+
+        self.received = 0
+        self.published = 0
+        self.dropped = 0
+        self.max_backlog = 0
+        self.alert_batches = 0
+        self.capture = None  # SessionCapture, если сессия записывается
+
     def start(self):
         self.mqtt_client = mqtt.Client(client_id=self.mqtt_id,callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
         self.mqtt_client.username_pw_set(self.username,self.password)
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
         self.mqtt_client.will_set("server/status", "offline", qos=1)
-        self.mqtt_client.connect(self.broker_host, self.broker_port, 60)
+        # Соединение устанавливает сетевой поток, окно не ждет брокера; при неудаче - повтор
+        self.mqtt_client.connect_async(self.broker_host, self.broker_port, 60)
         #self.mqtt_client.loop_start()
-        threading.Thread(target=self.mqtt_client.loop_forever, daemon=True).start()
+        threading.Thread(target=self.mqtt_client.loop_forever, kwargs={"retry_first_connection": True},
+                         daemon=True).start()
+        self.publisher_thread = threading.Thread(target=self._publish_loop, daemon=True)
+        self.publisher_thread.start()
 
 
     def on_connect(self, client, userdata, flags, reason_code, properties):
@@ -38,9 +74,107 @@ class MqttController(QObject):
         self.mqtt_client.subscribe(self.discovery_topic)
 
     def on_message(self, client, userdata, message):
-        self.mqtt_message_recieved.emit(message.topic,message.payload)
-    def publish(self,topic, payload, qos = 0):
-        self.mqtt_client.publish(topic,payload,qos)
+        self.received += 1
+        if self.capture:
+            self.capture.record_mqtt(message.topic, message.payload, time.time())
+        with span("mqtt_receive", topic=message.topic):
+            self.mqtt_message_recieved.emit(message.topic,message.payload)
+
+    def publish(self, topic, payload, qos=0, retain=False) -> bool:
+        if qos == 0:
+            with self.outbound_lock:
+                if self.best_effort_queued >= OUTBOUND_QUEUE_MAXSIZE:
+                    self.dropped += 1
+                    return False
+                self.best_effort_queued += 1
+        self.outbound.put((topic, payload, qos, retain))
+        self.max_backlog = max(self.max_backlog, self.outbound.qsize())
+        return True
+
+    def publish_alert(self, event):
+        with self.alerts_lock:
+            if not self.pending_alerts:
+                self.pending_alerts_since = time.monotonic()
+            self.pending_alerts.append(event)
+
+    def flush(self, timeout=0.5):
+        deadline = time.monotonic() + timeout
+        while self._unsent() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _unsent(self) -> bool:
+        # Сообщение, взятое из очереди, еще не отправлено: ждем его публикации, а не пустой очереди
+        if self.outbound.unfinished_tasks or self.pending_alerts or self.alerts_in_flight:
+            return True
+        return self.last_sent is not None and not self.last_sent.is_published()
+
+    @property
+    def backlog(self) -> int:
+        return self.outbound.qsize()
+
+    def stats(self) -> dict:
+        return {"received": self.received,
+                "published": self.published,
+                "dropped": self.dropped,
+                "backlog": self.backlog,
+                "max_backlog": self.max_backlog,
+                "pending_alerts": len(self.pending_alerts),
+                "alert_batches": self.alert_batches}
+
+    def _publish_loop(self):
+        while True:
+            try:
+                topic, payload, qos, retain = self.outbound.get(timeout=ALERT_BATCH_INTERVAL)
+            except queue.Empty:
+                pass
+            else:
+                if qos == 0:
+                    with self.outbound_lock:
+                        self.best_effort_queued -= 1
+                try:
+                    self.last_sent = self.mqtt_client.publish(topic, payload, qos, retain)
+                    self.published += 1
+                except Exception as e:
+                    # Поток-публикатор один на всех: ошибка одного сообщения не должна его остановить
+                    print(f"[MQTT] publish to {topic} failed: {e!r}")
+                finally:
+                    self.outbound.task_done()
+            if self.pending_alerts and time.monotonic() - self.pending_alerts_since >= ALERT_BATCH_INTERVAL:
+                try:
+                    self._flush_alerts()
+                except Exception as e:
+                    print(f"[MQTT] alert batch failed: {e!r}")
+
+    def _flush_alerts(self):
+        with self.alerts_lock:
+            events, self.pending_alerts = self.pending_alerts, []
+            self.alerts_in_flight = len(events)
+        try:
+            self._publish_alerts(events)
+        finally:
+            self.alerts_in_flight = 0
+
+    def _publish_alerts(self, events: list):
+        by_device: dict[str, list[dict]] = {}
+        for event in events:
+            by_device.setdefault(event.device_id, []).append(asdict(event))
+            zones = self.alarm_state.setdefault(event.device_id, {})
+            if event.state == ALERT_RAISED:
+                zones[event.zone_index] = asdict(event)
+            else:
+                zones.pop(event.zone_index, None)
+
+        for device_id, device_events in by_device.items():
+            self.mqtt_client.publish(f"{device_id}/alerts", json.dumps(device_events), 1)
+            # retained: подписчик сразу получает текущее состояние тревог без повтора истории
+            state = list(self.alarm_state[device_id].values())
+            self.mqtt_client.publish(f"{device_id}/alerts/state", json.dumps(state), 1, True)
+
+        self.mqtt_client.publish(ALERTS_TOPIC, json.dumps([asdict(event) for event in events]), 1)
+        server_state = {device_id: list(zones.values()) for device_id, zones in self.alarm_state.items() if zones}
+        self.last_sent = self.mqtt_client.publish(f"{ALERTS_TOPIC}/state", json.dumps(server_state), 1, True)
+        self.published += 2 * len(by_device) + 2
+        self.alert_batches += 1
 
     def subscribe(self,topic, qos = 0):
         print(topic)
@@ -61,7 +195,8 @@ class ZeroconfService:
         self.zeroconf_server = None
         self.service_info = None
     def start(self):
-        self.zeroconf_server = Zeroconf()
+        # Zeroconf держит свой поток с циклом asyncio; пробы и анонсы идут там, start() не ждет их
+        self.zeroconf_server = AsyncZeroconf()
         self.service_info = ServiceInfo(
             self.service_type,
             self.service_name,
@@ -70,6 +205,25 @@ class ZeroconfService:
             properties={"desc": "Test HTTP Service"},
             server="thermocam-server.local."
         )
-        self.zeroconf_server.register_service(self.service_info)
+        future = asyncio.run_coroutine_threadsafe(self._register(), self.zeroconf_server.zeroconf.loop)
+        future.add_done_callback(self._on_registered)
+
+    async def _register(self):
+        registered = await self.zeroconf_server.async_register_service(self.service_info)
+        await registered
+
+    def _on_registered(self, future):
+        # Без колбэка ошибка (например NonUniqueNameException) осталась бы в брошенном future
+        if future.cancelled():
+            print(f"[MDNS] registration of {self.service_name} cancelled")
+        elif future.exception():
+            print(f"[MDNS] registration of {self.service_name} failed: {future.exception()!r}")
+        else:
+            print(f"[MDNS] registered {self.service_name}")
+
+    def stop(self):
+        if self.zeroconf_server:
+            self.zeroconf_server.zeroconf.close()
+            self.zeroconf_server = None
 
 
@@ -0,0 +1,134 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from models.model import ProcessingSettings
+from controllers.instrumentation import NULL_TIMER
+
+COLORMAPS = {
+    "hsv": cv2.COLORMAP_HSV,
+    "hot": cv2.COLORMAP_HOT,
+    "jet": cv2.COLORMAP_JET,
+    "inferno": cv2.COLORMAP_INFERNO
+}
+
+# Шкала квантования матрицы AMG8833 (0..80 °C в 256 уровней)
+SENSOR_MIN_T = 0.0
+SENSOR_MAX_T = 80.0
+QUANT_SCALE = 255 / (SENSOR_MAX_T - SENSOR_MIN_T)
+RANGE_EMA_ALPHA = 0.05
+
+
+def temperature_to_code(temperature: float) -> int:
+    return int(np.clip(round((temperature - SENSOR_MIN_T) * QUANT_SCALE), 0, 255))
+
+
+@lru_cache(maxsize=64)
+def build_lut(colormap: int, low_code: int, high_code: int) -> np.ndarray:
+    """256-entry BGR table: quantized temperature code -> colour for the given range"""
+    codes = np.arange(256, dtype=np.float32)
+    ramp = np.clip((codes - low_code) * 255 / max(high_code - low_code, 1), 0, 255)
+    lut = cv2.applyColorMap(ramp.astype(np.uint8).reshape(256, 1), colormap)
+    lut.flags.writeable = False
+    return lut
+
+
+class ThermalRange:
+    def __init__(self, settings: ProcessingSettings):
+        self.mode = settings.range_mode
+        self.low = settings.range_min
+        self.high = settings.range_max
+        self.initialized = self.mode == "fixed"
+
+    def update(self, matrix) -> tuple[int, int]:
+        if self.mode != "fixed":
+            low, high = float(matrix.min()), float(matrix.max())
+            if not self.initialized:
+                self.low, self.high = low, high
+                self.initialized = True
+            else:
+                self.low += RANGE_EMA_ALPHA * (low - self.low)
+                self.high += RANGE_EMA_ALPHA * (high - self.high)
+        return temperature_to_code(self.low), temperature_to_code(self.high)
+
+
+class ProcessingPipeline:
+    """Per-device processing settings compiled into the stages the overlay mode needs"""
+
+    def __init__(self, settings: ProcessingSettings):
+        self.colormap = COLORMAPS.get(settings.heatmap_colormap, cv2.COLORMAP_JET)
+        self.alpha = settings.thermo_alpha / 100
+        self.video_filter = {
+            "gray": self._gray,
+            "edges": self._edges
+        }.get(settings.video_filter)
+
+        mode = settings.overlay_mode
+        self.use_video = mode != "thermal"
+        self.use_heatmap = mode != "video"
+
+        self.range = ThermalRange(settings)
+
+        self.shape = None
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        self.shape = shape
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.grad_x = np.empty((height, width), dtype=np.float32)
+        self.grad_y = np.empty((height, width), dtype=np.float32)
+        self.magnitude = np.empty((height, width), dtype=np.float32)
+        self.matrix_codes = None
+        self.thermal_u8 = np.empty((height, width), dtype=np.uint8)
+        self.filtered = np.empty((height, width, 3), dtype=np.uint8)
+        self.heatmap = np.empty((height, width, 3), dtype=np.uint8)
+
+    def process(self, frame, matrix, timer=NULL_TIMER):
+        if frame.shape != self.shape:
+            self._allocate(frame.shape)
+        # Результат уходит в GUI-поток по ссылке и может ждать в очереди сколько угодно кадров,
+        # поэтому выходной буфер свой у каждого кадра; переиспользуются только промежуточные
+        out = np.empty(self.shape, dtype=np.uint8)
+
+        if not self.use_video:
+            heatmap = self.create_heatmap(matrix, out)
+            timer.lap("heatmap")
+            return heatmap
+
+        video = frame
+        if self.video_filter:
+            video = self.video_filter(frame, out if not self.use_heatmap else self.filtered)
+            timer.lap("filter")
+        if not self.use_heatmap:
+            return video
+
+        heatmap = self.create_heatmap(matrix, self.heatmap)
+        timer.lap("heatmap")
+        blended = cv2.addWeighted(video, 1, heatmap, self.alpha, 0, dst=out)
+        timer.lap("blend")
+        return blended
+
+    def create_heatmap(self, matrix, dst):
+        height, width = self.shape[:2]
+        if self.matrix_codes is None or self.matrix_codes.shape != matrix.shape:
+            self.matrix_codes = np.empty(matrix.shape, dtype=np.uint8)
+        # Квантуем 8x8 до масштабирования, дальше работаем только с uint8.
+        # Обрезаем как temperature_to_code: convertScaleAbs отразил бы минус в теплые коды
+        codes = np.clip(np.rint((matrix - SENSOR_MIN_T) * QUANT_SCALE), 0, 255)
+        np.copyto(self.matrix_codes, codes, casting="unsafe")
+        cv2.resize(self.matrix_codes, (width, height), dst=self.thermal_u8, interpolation=cv2.INTER_CUBIC)
+        lut = build_lut(self.colormap, *self.range.update(matrix))
+        return cv2.applyColorMap(self.thermal_u8, lut, dst=dst)
+
+    def _gray(self, frame, dst):
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        return cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR, dst=dst)
+
+    def _edges(self, frame, dst):
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.Sobel(self.gray, cv2.CV_32F, 1, 0, dst=self.grad_x, ksize=3)
+        cv2.Sobel(self.gray, cv2.CV_32F, 0, 1, dst=self.grad_y, ksize=3)
+        cv2.magnitude(self.grad_x, self.grad_y, magnitude=self.magnitude)
+        cv2.convertScaleAbs(self.magnitude, dst=self.gray)
+        return cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR, dst=dst)
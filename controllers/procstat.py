@@ -0,0 +1,46 @@
+import os
+import time
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def cpu_seconds(pid: int | str) -> float | None:
+    """user + system CPU time of a process from /proc, None if it is gone or /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Имя процесса в скобках может содержать пробелы - поля считаем после последней ")"
+    fields = stat[stat.rfind(")") + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def rss_bytes(pid: int | str) -> int | None:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return None
+
+
+class CpuSampler:
+    """CPU utilisation of a set of processes between consecutive samples (1.0 = one core)"""
+
+    def __init__(self):
+        self.last: dict[int, tuple[float, float]] = {}
+
+    def sample(self, pids) -> dict[int, float]:
+        now = time.monotonic()
+        usage = {}
+        for pid in pids:
+            cpu = cpu_seconds(pid)
+            if cpu is None:
+                self.last.pop(pid, None)
+                continue
+            previous = self.last.get(pid)
+            if previous:
+                usage[pid] = (cpu - previous[1]) / max(now - previous[0], 1e-6)
+            self.last[pid] = (now, cpu)
+        return usage
@@ -0,0 +1,68 @@
+import os
+from collections import deque
+
+import numpy as np
+
+from models.container import ContainerWriter
+
+CLIPS_DIR = "clips"
+PREROLL_SECONDS = 10
+POSTROLL_SECONDS = 10
+
+
+class PrerollRecorder:
+    """Keeps the last seconds of raw stream data; on trigger flushes pre-roll and records post-roll"""
+
+    def __init__(self, preroll: float = PREROLL_SECONDS, device_id: str = ""):
+        self.preroll = preroll
+        self.device_id = device_id
+        self.frames: deque[tuple[float, bytes]] = deque()
+        self.matrices: deque[tuple[float, np.ndarray]] = deque()
+        self.clip: ContainerWriter | None = None
+        self.clip_end = 0.0
+
+    def add_frame(self, ts: float, jpeg: bytes) -> str | None:
+        self.frames.append((ts, jpeg))
+        self._trim(self.frames, ts)
+        if self.clip:
+            self.clip.write_jpeg(ts, jpeg)
+            return self._finish_if_due(ts)
+        return None
+
+    def add_matrix(self, ts: float, matrix: np.ndarray):
+        self.matrices.append((ts, matrix))
+        self._trim(self.matrices, ts)
+        if self.clip:
+            self.clip.write_thermal(ts, matrix)
+
+    def trigger(self, path: str, post_roll: float = POSTROLL_SECONDS, now: float = 0.0):
+        now = now or (self.frames[-1][0] if self.frames else 0.0)
+        if self.clip:
+            # Повторная тревога продлевает текущий клип
+            self.clip_end = max(self.clip_end, now + post_roll)
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.clip = ContainerWriter(path, device_id=self.device_id, preroll=self.preroll)
+        self.clip_end = now + post_roll
+        # Индекс контейнера сортируется при закрытии, пре-ролл пишем как есть
+        for ts, jpeg in self.frames:
+            self.clip.write_jpeg(ts, jpeg)
+        for ts, matrix in self.matrices:
+            self.clip.write_thermal(ts, matrix)
+
+    def close(self) -> str | None:
+        if not self.clip:
+            return None
+        path = self.clip.path
+        self.clip.close()
+        self.clip = None
+        return path
+
+    def _finish_if_due(self, ts: float) -> str | None:
+        if ts >= self.clip_end:
+            return self.close()
+        return None
+
+    def _trim(self, ring: deque, now: float):
+        while ring and ring[0][0] < now - self.preroll:
+            ring.popleft()
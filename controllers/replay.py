@@ -0,0 +1,204 @@
+import glob
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from models.container import ContainerReader, ContainerWriter, CHUNK_MQTT
+
+CAPTURE_DIR = "captures"
+SESSION_FILE = "session.json"
+MQTT_LOG = "mqtt.tclip"
+REPLAY_SCHEME = "replay"
+REPLAY_BATCH = 256  # сообщений за проход цикла событий при speed=0
+REPLAY_WAIT = 0.05  # секунды, дольше read не ждет следующего кадра - воркер должен отвечать на команды
+
+
+class SessionCapture:
+    """Records incoming MQTT messages and raw MJPEG frames of every stream with capture timestamps"""
+
+    def __init__(self, directory: str = CAPTURE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.started = time.time()
+        with open(os.path.join(directory, SESSION_FILE), "w") as f:
+            json.dump({"started": self.started}, f)
+        self.lock = threading.Lock()
+        self.mqtt = ContainerWriter(os.path.join(directory, MQTT_LOG), source="mqtt")
+
+    def record_mqtt(self, topic: str, payload: bytes, ts: float):
+        with self.lock:
+            if self.mqtt:
+                self.mqtt.write(CHUNK_MQTT, ts, topic.encode() + b"\0" + payload)
+
+    def video_path(self, device_id: str) -> str:
+        # Каждый запуск потока пишет свой файл, при воспроизведении они склеиваются по времени
+        return os.path.join(self.directory, f"{device_id}-{int(time.time() * 1000)}.tclip")
+
+    def close(self):
+        with self.lock:
+            if self.mqtt:
+                self.mqtt.close()
+                self.mqtt = None
+
+
+def read_session(directory: str) -> dict:
+    with open(os.path.join(directory, SESSION_FILE)) as f:
+        return json.load(f)
+
+
+def captured_devices(directory: str) -> list[str]:
+    names = (os.path.basename(path).rsplit("-", 1)[0] for path in glob.glob(os.path.join(directory, "*-*.tclip")))
+    return sorted(set(names))
+
+
+def replay_url(directory: str, device_id: str, origin: float, start: float, speed: float) -> str:
+    query = urllib.parse.urlencode({"origin": origin, "start": start, "speed": speed})
+    return f"{REPLAY_SCHEME}://{urllib.parse.quote(os.path.abspath(directory))}/{device_id}?{query}"
+
+
+class ReplayStream:
+    """Drop-in for MjpegStream that plays a device's captured frames on the shared replay clock"""
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlparse(url)
+        path = urllib.parse.unquote(parsed.netloc + parsed.path)
+        self.directory, self.device_id = os.path.split(path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        self.origin = float(query.get("origin", 0))
+        self.start = float(query.get("start", 0))
+        self.speed = float(query.get("speed", 1))
+        self.readers: list[ContainerReader] = []
+        self.reader = 0
+        self.position = 0
+        self.finished = False  # кадры кончились; None из read без него - кадр еще не наступил
+
+    def open(self) -> bool:
+        paths = sorted(glob.glob(os.path.join(self.directory, f"{glob.escape(self.device_id)}-*.tclip")))
+        self.readers = [reader for reader in map(ContainerReader, paths) if len(reader.jpeg_index)]
+        if self.speed > 0:
+            # Поток открыт посреди сессии - как и живая камера, начинаем с текущего момента
+            self._seek(self.origin + (time.time() - self.start) * self.speed)
+        return bool(self.readers)
+
+    def isOpened(self) -> bool:
+        return bool(self.readers)
+
+    def _seek(self, ts: float):
+        for i, reader in enumerate(self.readers):
+            if reader.end >= ts:
+                self.reader = i
+                self.position = int(reader.jpeg_index["ts"].searchsorted(ts))
+                return
+        self.reader = len(self.readers)
+
+    def read(self) -> tuple[bytes, float] | None:
+        while self.reader < len(self.readers) and self.position >= len(self.readers[self.reader].jpeg_index):
+            self.reader += 1
+            self.position = 0
+        if self.reader >= len(self.readers):
+            self.finished = True
+            return None
+        ts, jpeg = self.readers[self.reader].jpeg(self.position)
+        if self.speed > 0:
+            delay = self.start + (ts - self.origin) / self.speed - time.time()
+            if delay > 0:
+                # Пауза в записи может длиться минуты: ждем по частям, кадр отдадим при следующем вызове
+                time.sleep(min(delay, REPLAY_WAIT))
+                if delay > REPLAY_WAIT:
+                    return None
+        self.position += 1
+        return bytes(jpeg), time.time()
+
+    def release(self):
+        for reader in self.readers:
+            reader.close()
+        self.readers = []
+
+
+class MqttReplay(QObject):
+    """Feeds captured MQTT messages into a handler at 1x, Nx or as fast as possible (speed=0)"""
+    finished = pyqtSignal()
+
+    def __init__(self, directory: str, handler, speed: float = 1.0):
+        super().__init__()
+        self.directory = directory
+        self.handler = handler
+        self.speed = speed
+        self.reader = ContainerReader(os.path.join(directory, MQTT_LOG))
+        self.index = self.reader.index[self.reader.index["kind"] == CHUNK_MQTT]
+        self.origin = read_session(directory)["started"]
+        self.start = 0.0
+        self.position = 0
+        self.delivered = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._tick)
+
+    def begin(self, start: float | None = None):
+        self.start = start or time.time()
+        self.position = 0
+        self.timer.start(0)
+
+    def _tick(self):
+        if self.speed > 0:
+            now_ts = self.origin + (time.time() - self.start) * self.speed
+            last = int(self.index["ts"].searchsorted(now_ts, side="right"))
+        else:
+            last = min(self.position + REPLAY_BATCH, len(self.index))
+
+        for entry in self.index[self.position:last]:
+            topic, _, payload = bytes(self.reader.payload(entry)).partition(b"\0")
+            self.handler(topic.decode(), payload)
+        self.delivered += last - self.position
+        self.position = last
+
+        if self.position >= len(self.index):
+            self.finished.emit()
+            return
+        if self.speed > 0:
+            due = self.start + (float(self.index["ts"][self.position]) - self.origin) / self.speed
+            self.timer.start(max(int((due - time.time()) * 1000), 0))
+        else:
+            self.timer.start(0)
+
+
+class OfflineMqtt(QObject):
+    """MqttController stand-in for replay: the server runs without a broker and publishes nothing"""
+    mqtt_message_recieved = pyqtSignal(str, bytes)
+    device_discovered = pyqtSignal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.received = 0
+        self.published = 0
+
+    def start(self):
+        pass
+
+    def publish(self, topic, payload, qos=0, retain=False) -> bool:
+        self.published += 1
+        return True
+
+    def publish_alert(self, event):
+        self.published += 1
+
+    def subscribe(self, topic, qos=0):
+        pass
+
+    def unsubscribe(self, topic):
+        pass
+
+    def flush(self, timeout=0.5):
+        pass
+
+    @property
+    def backlog(self) -> int:
+        return 0
+
+    def stats(self) -> dict:
+        return {"received": self.received, "published": self.published, "dropped": 0, "backlog": 0,
+                "max_backlog": 0, "pending_alerts": 0, "alert_batches": 0}
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer
+
+from controllers.video import FRAMERATE
+
+FOCUSED_FRAMERATE = FRAMERATE
+GRID_FRAMERATE = 10
+MIN_FRAMERATE = 1
+CPU_BUDGET = 0.75  # секунды обработки в секунду, общие для всех камер
+SCHEDULER_INTERVAL_MS = 1000
+COST_EMA_ALPHA = 0.2
+RATE_STEP = 0.5
+
+
+@dataclass
+class StreamRate:
+    target_fps: float
+    achieved_fps: float = 0
+    processing_time: float = 0  # EMA, seconds per frame
+    frames: int = 0  # processed since last tick
+
+
+class FrameRateScheduler(QObject):
+    framerate_changed = pyqtSignal(str, float)  # device_id, target fps
+
+    def __init__(self, focused_fps: float = FOCUSED_FRAMERATE, grid_fps: float = GRID_FRAMERATE,
+                 cpu_budget: float = CPU_BUDGET):
+        super().__init__()
+        self.focused_fps = focused_fps
+        self.grid_fps = grid_fps
+        self.cpu_budget = cpu_budget
+        self.streams: dict[str, StreamRate] = {}
+        self.focused_id: str | None = None
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self._tick)
+        self.timer.start(SCHEDULER_INTERVAL_MS)
+
+    def add_stream(self, device_id: str):
+        if device_id not in self.streams:
+            self.streams[device_id] = StreamRate(target_fps=self._nominal_fps(device_id))
+            self.framerate_changed.emit(device_id, self.streams[device_id].target_fps)
+        self._rebalance()
+
+    def remove_stream(self, device_id: str):
+        self.streams.pop(device_id, None)
+        if self.focused_id == device_id:
+            self.focused_id = None
+        self._rebalance()
+
+    def set_focused(self, device_id: str):
+        self.focused_id = device_id or None
+        self._rebalance()
+
+    def set_grid_fps(self, fps: float):
+        self.grid_fps = fps
+        self._rebalance()
+
+    def report_frame(self, device_id: str, processing_time: float):
+        stream = self.streams.get(device_id)
+        if not stream:
+            return
+        stream.frames += 1
+        if stream.processing_time == 0:
+            stream.processing_time = processing_time
+        else:
+            stream.processing_time += COST_EMA_ALPHA * (processing_time - stream.processing_time)
+
+    def stats(self) -> dict[str, dict]:
+        return {device_id: {"target_fps": stream.target_fps,
+                            "achieved_fps": stream.achieved_fps,
+                            "processing_time": stream.processing_time,
+                            "focused": device_id == self.focused_id}
+                for device_id, stream in self.streams.items()}
+
+    def _nominal_fps(self, device_id: str) -> float:
+        return self.focused_fps if device_id == self.focused_id else self.grid_fps
+
+    def _tick(self):
+        interval = SCHEDULER_INTERVAL_MS / 1000
+        for stream in self.streams.values():
+            stream.achieved_fps = stream.frames / interval
+            stream.frames = 0
+        self._rebalance()
+
+    def _rebalance(self):
+        targets = {device_id: self._nominal_fps(device_id) for device_id in self.streams}
+        load = sum(targets[d] * s.processing_time for d, s in self.streams.items())
+
+        if load > self.cpu_budget:
+            # Сначала урезаем плитки сетки, развернутую камеру - в последнюю очередь
+            focused = self.focused_id if self.focused_id in self.streams else None
+            focused_load = targets[focused] * self.streams[focused].processing_time if focused else 0
+            grid = [d for d in self.streams if d != focused]
+            grid_load = sum(targets[d] * self.streams[d].processing_time for d in grid)
+            available = self.cpu_budget - focused_load
+
+            if available > 0:
+                # load > budget, значит grid_load > available > 0
+                scale = available / grid_load
+                for d in grid:
+                    targets[d] *= scale
+            else:
+                for d in grid:
+                    targets[d] = MIN_FRAMERATE
+                grid_load = sum(MIN_FRAMERATE * self.streams[d].processing_time for d in grid)
+                if focused and self.streams[focused].processing_time > 0:
+                    targets[focused] = (self.cpu_budget - grid_load) / self.streams[focused].processing_time
+
+        for device_id, stream in self.streams.items():
+            target = max(MIN_FRAMERATE, round(targets[device_id] / RATE_STEP) * RATE_STEP)
+            target = min(target, self._nominal_fps(device_id))
+            if target != stream.target_fps:
+                stream.target_fps = target
+                self.framerate_changed.emit(device_id, target)
@@ -0,0 +1,103 @@
+import time
+from dataclasses import dataclass
+
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer
+
+from controllers.video import VideoProcessController
+
+WATCHDOG_INTERVAL_MS = 1000
+STARTUP_TIMEOUT = 15.0  # секунды на подключение к камере до первого кадра
+STALL_TIMEOUT = 10.0  # секунды без кадров и отчетов - воркер завис
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+ESCALATE_AFTER = 3  # неудачных попыток подряд до состояния ERROR
+HEALTHY_AFTER = 30.0  # секунды стабильной работы, после которых счетчик неудач сбрасывается
+
+
+@dataclass
+class WorkerHealth:
+    failures: int = 0
+    restart_at: float = 0.0  # time.monotonic() запланированного перезапуска, 0 - не запланирован
+    healthy_since: float = 0.0
+    failed: bool = False
+    reason: str = ""
+
+
+class StreamSupervisor(QObject):
+    """Watchdog of video workers: restarts dead or stalled ones with exponential backoff"""
+
+    worker_restarted = pyqtSignal(str, int, str)  # device_id, attempt, reason
+    device_failed = pyqtSignal(str, str)  # device_id, reason
+    device_recovered = pyqtSignal(str)
+
+    def __init__(self, streams: VideoProcessController):
+        super().__init__()
+        self.streams = streams
+        self.health: dict[str, WorkerHealth] = {}
+        self.restarts: dict[str, int] = {}
+        self.last_error: dict[str, str] = {}
+        self.streams.event_received.connect(self._on_event)
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self._tick)
+        self.timer.start(WATCHDOG_INTERVAL_MS)
+
+    def stop(self):
+        self.timer.stop()
+
+    def _on_event(self, device_id: str, event: str, msg: str):
+        if event == "error":
+            self.last_error[device_id] = msg
+
+    def _check(self, device_id: str, now: float) -> str | None:
+        process, _, _ = self.streams.workers[device_id]
+        if not process.is_alive():
+            return self.last_error.pop(device_id, None) or f"worker exited with code {process.exitcode}"
+        last_seen = self.streams.last_seen.get(device_id)
+        if last_seen is None:
+            if now - self.streams.started.get(device_id, now) > STARTUP_TIMEOUT:
+                return "no frames since start"
+        elif now - last_seen > STALL_TIMEOUT:
+            return f"stalled for {now - last_seen:.0f} s"
+        return None
+
+    def _tick(self):
+        now = time.monotonic()
+        for device_id in list(self.streams.workers):
+            if device_id in self.streams.paused:
+                continue
+            health = self.health.setdefault(device_id, WorkerHealth(healthy_since=now))
+            if health.restart_at:
+                if now >= health.restart_at:
+                    self._restart(device_id, health, now)
+                continue
+            reason = self._check(device_id, now)
+            if reason:
+                self._fail(device_id, health, reason, now)
+            elif health.failures and now - health.healthy_since >= HEALTHY_AFTER:
+                health.failures = 0
+                if health.failed:
+                    health.failed = False
+                    self.device_recovered.emit(device_id)
+        # Остановленные штатно потоки больше не наблюдаем
+        for device_id in list(self.health):
+            if device_id not in self.streams.workers:
+                del self.health[device_id]
+                self.last_error.pop(device_id, None)
+
+    def _fail(self, device_id: str, health: WorkerHealth, reason: str, now: float):
+        health.failures += 1
+        health.reason = reason
+        delay = min(BACKOFF_BASE * 2 ** (health.failures - 1), BACKOFF_MAX)
+        health.restart_at = now + delay
+        print(f"[SUPERVISOR] {device_id}: {reason}, restart #{health.failures} in {delay:.1f} s")
+        if health.failures >= ESCALATE_AFTER and not health.failed:
+            health.failed = True
+            self.device_failed.emit(device_id, reason)
+
+    def _restart(self, device_id: str, health: WorkerHealth, now: float):
+        health.restart_at = 0.0
+        health.healthy_since = now
+        self.streams.restart_stream(device_id)
+        self.restarts[device_id] = self.restarts.get(device_id, 0) + 1
+        self.worker_restarted.emit(device_id, health.failures, health.reason)
@@ -0,0 +1,96 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Трассировка включается переменной окружения; трассируется каждый SAMPLE_EVERY-й кадр
+ENABLED = os.environ.get("THERMO_TRACE", "") not in ("", "0")
+SAMPLE_EVERY = max(int(os.environ.get("THERMO_TRACE_SAMPLE", "10")), 1)
+TRACE_RING_SIZE = 100_000
+TRACE_DIR = "traces"
+TRACE_COLLECT_MS = 500  # сколько ждать ответа воркеров перед записью файла
+
+NULL_SPAN = contextlib.nullcontext()
+
+
+def is_sampled(captured: float) -> bool:
+    """Same decision in every process for a given frame, so a sampled frame is traced end to end"""
+    return ENABLED and int(captured * 1e6) % SAMPLE_EVERY == 0
+
+
+class Tracer:
+    """Ring of complete spans of this process, exported in Chrome Trace Event format"""
+
+    def __init__(self, process_name: str = "server"):
+        self.reset(process_name)
+
+    def reset(self, process_name: str):
+        # deque.append атомарна - писать можно из любого потока без блокировок
+        self.events: deque = deque(maxlen=TRACE_RING_SIZE)
+        self.pid = os.getpid()
+        self.process_name = process_name
+        self.threads: dict[int, str] = {}
+        self.remote: dict[str, list[dict]] = {}
+        self.counter = 0
+
+    def sample(self) -> bool:
+        self.counter += 1
+        return ENABLED and self.counter % SAMPLE_EVERY == 0
+
+    def complete(self, name: str, start: float, end: float, **args):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.events.append((name, start, end - start, tid, args))
+
+    def export(self) -> list[dict]:
+        events = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                   "args": {"name": self.process_name}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in list(self.threads.items())]
+        events += [{"name": name, "cat": "pipeline", "ph": "X", "pid": self.pid, "tid": tid,
+                    "ts": start * 1e6, "dur": duration * 1e6, "args": args}
+                   for name, start, duration, tid, args in list(self.events)]
+        return events
+
+    def merge_remote(self, source: str, events: list[dict]):
+        self.remote[source] = events
+
+    def dump(self, directory: str = TRACE_DIR) -> str:
+        events = self.export()
+        for remote in self.remote.values():
+            events += remote
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+TRACER = Tracer()
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        TRACER.complete(self.name, self.start, time.time(), **self.args)
+        return False
+
+
+def span(name: str, captured: float = 0.0, **args):
+    """Context manager tracing a sampled frame (by capture time) or every SAMPLE_EVERY-th call"""
+    if not ENABLED:
+        return NULL_SPAN
+    sampled = is_sampled(captured) if captured else TRACER.sample()
+    return Span(name, args) if sampled else NULL_SPAN
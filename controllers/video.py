@@ -1,52 +1,122 @@
-from dataclasses import dataclass
-
-from PyQt6.QtCore import QObject, pyqtSignal, QTimer, QPointF
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer
 import numpy as np
 import cv2
 import multiprocessing as mp
+from multiprocessing.connection import wait as wait_processes
 import time
 import queue
+import os
 
 from models.model import ProcessingSettings, Esp32Manager, AlertZone
-from views.AlertsEditorOverlay import transform_coords_f2i, transform_coords_i2f
+from models.thermal_store import ThermalStore
+from models.history import ThermalHistory
+from models.rollups import RollupStore
+from models.thumbnails import ThumbnailCache
+from controllers.pipeline import ProcessingPipeline
+from controllers.alerts import AlertEngine
+from controllers.zones import ZonePoint, ZoneSampler
+from controllers.mjpeg import MjpegStream
+from controllers.recorder import PrerollRecorder, CLIPS_DIR, POSTROLL_SECONDS
+from controllers.replay import ReplayStream, SessionCapture, REPLAY_SCHEME
+from models.container import ContainerWriter
+from controllers import instrumentation
+from controllers.instrumentation import stage_timer
+from controllers.tracing import TRACER, is_sampled, span
 
 MJPEG_PORT = 80
 FRAMERATE = 25
 QUEUE_MAXSIZE = 5
-
-
-@dataclass
-class ZonePoint:
-    point: QPointF = QPointF()
-    temperature: float = 0
+STATS_INTERVAL = 1.0  # секунды между отчетами воркера
+RECONNECT_DELAY = 0.5  # первая пауза перед переподключением к камере, дальше удваивается
+RECONNECT_DELAY_MAX = 5.0
+WARM_POOL_SIZE = 2  # заранее запущенные воркеры без камеры: старт потока без запуска процесса
+WARM_POOL_MAX = 16  # предел для reserve(), каждый воркер держит свою копию cv2
+STOP_TIMEOUT = 0.5  # ожидание одного воркера при штатной остановке потока
+SHUTDOWN_TIMEOUT = 2.0  # общий срок для всех воркеров при выходе
+KILL_TIMEOUT = 0.5  # после terminate(), перед kill()
+WARMUP_JPEG = cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
 
 
 
 
 class VideoProcessWorker(mp.Process):
-    def __init__(self, device_id: str, device_ip: str, image_queue: mp.Queue, pipe: mp.Pipe):
+    def __init__(self, device_id: str | None, device_ip: str, image_queue: mp.Queue, pipe: mp.Pipe,
+                 video_url: str | None = None, capture_path: str | None = None):
         super().__init__()
-        self.device_id = device_id
         self.image_queue = image_queue
         self.pipe = pipe
-        self.video_url = f"http://{device_ip}:{MJPEG_PORT}/mjpeg/1"
         self.running = True
         self.paused = True
         self.settings = None
         self.zones = None
         self.last_matrix = None
+        self.framerate = FRAMERATE
+        # Воркер из пула стартует без камеры и ждет сообщения "assign"
+        self.device_id = None
+        if device_id is not None:
+            self.assign(device_id, device_ip, video_url, capture_path)
+
+    def assign(self, device_id: str, device_ip: str, video_url: str | None = None, capture_path: str | None = None):
+        self.device_id = device_id
+        host = device_ip if ":" in device_ip else f"{device_ip}:{MJPEG_PORT}"
+        self.video_url = video_url or f"http://{host}/mjpeg/1"
+        self.capture_path = capture_path
+        self.recorder = PrerollRecorder(device_id=device_id)
+
+    def wait_assignment(self) -> bool:
+        if self.device_id is None:
+            # Первый imdecode инициализирует декодер - делаем это, пока воркер в пуле
+            cv2.imdecode(np.frombuffer(WARMUP_JPEG, dtype=np.uint8), cv2.IMREAD_COLOR)
+        while self.device_id is None:
+            try:
+                cmd = self.pipe.recv()
+            except EOFError:
+                return False  # сервер завершился, пока воркер ждал в пуле
+            if cmd == "stop":
+                return False
+            if isinstance(cmd, dict) and cmd["type"] == "assign":
+                self.assign(**cmd["content"])
+        return True
 
     def handle_update(self, msg):
         if msg["type"] == "matrix":
             self.last_matrix = msg["content"]
+            self.recorder.add_matrix(msg.get("ts", time.time()), msg["content"])
         if msg["type"] == "zones":
             self.zones = msg["content"]
         if msg["type"] == "settings":
             self.settings = msg["content"]
+        if msg["type"] == "framerate":
+            self.framerate = msg["content"]
+        if msg["type"] == "record":
+            self.recorder.trigger(msg["content"]["path"], msg["content"]["post_roll"], time.time())
+        if msg["type"] == "trace":
+            self.pipe.send({"type": "trace", "id": self.device_id, "content": TRACER.export()})
+
+    def send_stats(self, stats: dict):
+        content = dict(stats)
+        if instrumentation.ENABLED:
+            content["stages"] = instrumentation.REGISTRY.export()
+        self.pipe.send({
+            "type": "stats",
+            "id": self.device_id,
+            "content": content
+        })
 
     def run(self):
-        cap = cv2.VideoCapture(self.video_url)
-        if not cap.isOpened():
+        instrumentation.REGISTRY.reset()
+        if not self.wait_assignment():
+            return
+        # Недоставленные кадры при выходе не нужны - не ждем, пока их заберет сервер
+        self.image_queue.cancel_join_thread()
+        TRACER.reset(f"worker {self.device_id}")
+        # Читаем сырые JPEG: пре-ролл пишется без перекодирования, декодируются только отданные кадры
+        replay = self.video_url.startswith(REPLAY_SCHEME)
+        if replay:
+            cap = ReplayStream(self.video_url)
+        else:
+            cap = MjpegStream(self.video_url)
+        if not cap.open():
             self.pipe.send({
                 "type": "event",
                 "event": "error",
@@ -62,6 +132,12 @@ class VideoProcessWorker(mp.Process):
         })
 
         last_frame_time = time.time()
+        last_stats_time = last_frame_time
+        # read - кадров из потока, decoded - отдано в очередь, dropped - вытеснено из полной очереди
+        stats = {"read": 0, "decoded": 0, "dropped": 0}
+        capture = ContainerWriter(self.capture_path, device_id=self.device_id) if self.capture_path else None
+        reconnect_delay = RECONNECT_DELAY
+        reconnect_at = 0.0  # time.time() следующей попытки, 0 - поток открыт
 
         while self.running:
             if self.pipe.poll():
@@ -89,26 +165,107 @@ class VideoProcessWorker(mp.Process):
                 time.sleep(0.01)
                 continue
 
-            ret, frame = cap.read()
-            if not ret:
+            # Отчеты идут и без кадров (переподключение, пауза в записи) - иначе супервизор сочтет воркер зависшим
+            now = time.time()
+            if now - last_stats_time >= STATS_INTERVAL:
+                last_stats_time = now
+                self.send_stats(stats)
+
+            if reconnect_at:
+                # Ждем на pipe, а не в sleep - команды (stop) обрабатываются и во время паузы
+                if time.time() < reconnect_at:
+                    self.pipe.poll(min(reconnect_at - time.time(), 0.05))
+                    continue
+                if not cap.open():
+                    reconnect_delay = min(reconnect_delay * 2, RECONNECT_DELAY_MAX)
+                    reconnect_at = time.time() + reconnect_delay
+                    continue
+                reconnect_at = 0.0
+                reconnect_delay = RECONNECT_DELAY
+                self.pipe.send({
+                    "type": "event",
+                    "event": "reconnected",
+                    "id": self.device_id
+                })
+
+            timer = stage_timer(self.device_id)
+            read_start = time.time()
+            chunk = cap.read()
+            timer.lap("mjpeg_read")
+            if chunk is None:
+                if replay:
+                    if not cap.finished:
+                        continue  # следующий кадр записи еще не наступил
+                    self.pipe.send({
+                        "type": "event",
+                        "event": "error",
+                        "id": self.device_id,
+                        "msg": "Stream ended"
+                    })
+                    break
+                # Таймаут чтения или обрыв: камера могла притормозить - переподключаемся, а не выходим
+                cap.release()
+                reconnect_at = time.time() + reconnect_delay
+                self.pipe.send({
+                    "type": "event",
+                    "event": "reconnecting",
+                    "id": self.device_id,
+                    "msg": f"retry in {reconnect_delay:.1f} s"
+                })
                 continue
+            jpeg, captured = chunk
+            stats["read"] += 1
+            if capture:
+                capture.write_jpeg(captured, jpeg)
+
+            clip_path = self.recorder.add_frame(captured, jpeg)
+            if clip_path:
+                self.pipe.send({
+                    "type": "event",
+                    "event": "clip_saved",
+                    "id": self.device_id,
+                    "msg": clip_path
+                })
 
             now = time.time()
-            if now - last_frame_time >= 1.0 / FRAMERATE:
+            if is_sampled(captured):
+                TRACER.complete("mjpeg_read", read_start, captured, device=self.device_id)
+            if now - last_frame_time >= 1.0 / self.framerate:
+                frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                timer.lap("decode")
+                if frame is None:
+                    continue
                 if self.image_queue.full():
                     self.image_queue.get()
+                    stats["dropped"] += 1
                 last_frame_time = now
                 self.image_queue.put({
                     "type": "frame",
                     "id": self.device_id,
-                    "data": frame.copy()
+                    "data": frame,
+                    "ts": captured,
+                    "queued": time.time()
                 })
+                stats["decoded"] += 1
+                timer.lap("queue_put")
+                if is_sampled(captured):
+                    TRACER.complete("decode", now, time.time(), device=self.device_id)
+        if capture:
+            capture.close()
+        clip_path = self.recorder.close()
+        if clip_path:
+            self.pipe.send({
+                "type": "event",
+                "event": "clip_saved",
+                "id": self.device_id,
+                "msg": clip_path
+            })
         if cap:
             cap.release()
 
 
 class VideoProcessController(QObject):
-    frame_ready = pyqtSignal(str, object)  # device_id, frame
+    frame_ready = pyqtSignal(str, object, float)  # device_id, frame, capture timestamp
     event_received = pyqtSignal(str, str, str)  # device_id, event_type, msg (optional)
 
     overlay_ready = pyqtSignal(str, object)  # device_id, overlay frame
@@ -118,18 +275,44 @@ class VideoProcessController(QObject):
     def __init__(self):
         super().__init__()
         self.workers: dict[str, tuple[mp.Process, mp.Queue, mp.Pipe]] = {}
+        # Запись и воспроизведение сессий: подмена источника и копия сырых кадров
+        self.video_sources: dict[str, str] = {}
+        self.capture: SessionCapture | None = None
+        # Последние счетчики воркеров и число кадров, забранных из очередей
+        self.stats: dict[str, dict] = {}
+        self.polled: dict[str, int] = {}
+        # Для супервизора: адрес и fps нужны при перезапуске, время - для поиска зависших воркеров
+        self.addresses: dict[str, str] = {}
+        self.framerates: dict[str, float] = {}
+        self.started: dict[str, float] = {}  # time.monotonic() запуска воркера
+        self.last_seen: dict[str, float] = {}  # time.monotonic() последнего кадра или отчета
+        self.paused: set[str] = set()
+        self.pool: list[tuple[mp.Process, mp.Queue, mp.Pipe]] = []
+        self.pool_target = WARM_POOL_SIZE
+        QTimer.singleShot(0, self._fill_pool)
 
         self.poll_timer = QTimer()
         self.poll_timer.timeout.connect(self._poll_all)
         self.poll_timer.start(int(1000 // (FRAMERATE * 2)))
 
-    def update_matrix(self, device_id: str, matrix: list[list[float]]):
+    def update_matrix(self, device_id: str, matrix: list[list[float]], received: float | None = None):
         worker = self.workers.get(device_id)
         if worker:
             new_data = np.flipud(np.array(matrix, dtype=np.float32).T)
             _, _, pipe = worker
             pipe.send({"type": "matrix",
-                       "content": new_data})
+                       "content": new_data,
+                       "ts": received or time.time()})
+
+    def record_clip(self, device_id: str, post_roll: float = POSTROLL_SECONDS) -> str | None:
+        worker = self.workers.get(device_id)
+        if not worker:
+            return None
+        path = os.path.join(CLIPS_DIR, f"{device_id}_{time.strftime('%Y%m%d-%H%M%S')}.tclip")
+        _, _, pipe = worker
+        pipe.send({"type": "record",
+                   "content": {"path": path, "post_roll": post_roll}})
+        return path
 
     def update_zones(self, device_id, zones):
         worker = self.workers.get(device_id)
@@ -145,39 +328,152 @@ class VideoProcessController(QObject):
             pipe.send({"type": "settings",
                        "content": settings})
 
+    def set_framerate(self, device_id: str, framerate: float):
+        self.framerates[device_id] = framerate
+        worker = self.workers.get(device_id)
+        if worker:
+            _, _, pipe = worker
+            pipe.send({"type": "framerate",
+                       "content": framerate})
+
+    def _spawn_worker(self, device_id: str | None = None, device_ip: str = ""):
+        image_queue = mp.Queue(maxsize=QUEUE_MAXSIZE)
+        parent_pipe, child_pipe = mp.Pipe()
+        if device_id is None:
+            process = VideoProcessWorker(None, "", image_queue, child_pipe)
+        else:
+            process = VideoProcessWorker(device_id, device_ip, image_queue, child_pipe,
+                                         self.video_sources.get(device_id), self._capture_path(device_id))
+        process.start()
+        return process, image_queue, parent_pipe
+
+    def _capture_path(self, device_id: str) -> str | None:
+        return self.capture.video_path(device_id) if self.capture else None
+
+    def reserve(self, count: int):
+        """Grow the warm pool ahead of a burst of stream starts, e.g. restoring cameras at startup"""
+        self.pool_target = max(self.pool_target, min(count, WARM_POOL_MAX))
+        QTimer.singleShot(0, self._fill_pool)
+
+    def _acquire_worker(self, device_id: str, device_ip: str):
+        """Hand a warm worker from the pool to the device, spawning one only if the pool is empty"""
+        # Зарезервированный запас расходуется и к обычному размеру пула не пополняется
+        self.pool_target = max(self.pool_target - 1, WARM_POOL_SIZE)
+        QTimer.singleShot(0, self._fill_pool)
+        while self.pool:
+            process, image_queue, pipe = self.pool.pop()
+            if process.is_alive():
+                pipe.send({"type": "assign",
+                           "content": {"device_id": device_id, "device_ip": device_ip,
+                                       "video_url": self.video_sources.get(device_id),
+                                       "capture_path": self._capture_path(device_id)}})
+                return process, image_queue, pipe
+        return self._spawn_worker(device_id, device_ip)
+
+    def _fill_pool(self):
+        # По одному процессу за проход цикла событий, чтобы не подвешивать GUI
+        if len(self.pool) < self.pool_target:
+            self.pool.append(self._spawn_worker())
+            QTimer.singleShot(0, self._fill_pool)
+
+    def _attach(self, device_id: str, worker):
+        self.workers[device_id] = worker
+        self.started[device_id] = time.monotonic()
+        self.last_seen.pop(device_id, None)
+        _, _, pipe = worker
+        if device_id in self.framerates:
+            pipe.send({"type": "framerate", "content": self.framerates[device_id]})
+        if device_id not in self.paused:
+            pipe.send("play")
+
     def start_stream(self, device_id: str, device_ip: str):
+        self.paused.discard(device_id)
         worker = self.workers.get(device_id)
         if not worker:
-            image_queue = mp.Queue(maxsize=QUEUE_MAXSIZE)
-
-            parent_pipe, child_pipe = mp.Pipe()
-            process = VideoProcessWorker(device_id, device_ip, image_queue, child_pipe)
-            process.start()
-            self.workers[device_id] = (process, image_queue, parent_pipe)
-            parent_pipe.send("play")
+            self.addresses[device_id] = device_ip
+            self._attach(device_id, self._acquire_worker(device_id, device_ip))
         else:
             _, _, pipe = worker
             pipe.send("play")
 
+    def restart_stream(self, device_id: str):
+        """Replace the device's worker, dead or hung, with a warm one from the pool"""
+        worker = self.workers.pop(device_id, None)
+        if worker:
+            process, _, pipe = worker
+            if process.is_alive():
+                # Зависший воркер может не читать pipe - не ждем его
+                process.terminate()
+            process.join(timeout=0.1)
+            self._release(worker)
+        self.stats.pop(device_id, None)
+        self._attach(device_id, self._acquire_worker(device_id, self.addresses.get(device_id, "")))
+
     def pause_stream(self, device_id: str):
         worker = self.workers.get(device_id)
         if worker:
+            self.paused.add(device_id)
             _, _, pipe = worker
             pipe.send("pause")
 
     def stop_stream(self, device_id: str):
         worker = self.workers.get(device_id)
         if worker:
-            process, _, pipe = worker
-            pipe.send("stop")
-            process.join(timeout=0.5)
-            if process.is_alive():
-                process.terminate()
+            self._shutdown([worker], STOP_TIMEOUT)
             del self.workers[device_id]
+            self.stats.pop(device_id, None)
+            self.started.pop(device_id, None)
+            self.last_seen.pop(device_id, None)
+            self.paused.discard(device_id)
+
+    def request_traces(self):
+        for _, _, pipe in self.workers.values():
+            pipe.send({"type": "trace"})
 
     def stop_all_streams(self):
-        for device_id in list(self.workers.keys()):
-            self.stop_stream(device_id)
+        # Пул не пополняем, все воркеры останавливаются одновременно с общим сроком
+        self.pool_target = 0
+        workers = list(self.workers.values()) + self.pool
+        self._shutdown(workers, SHUTDOWN_TIMEOUT)
+        self.workers.clear()
+        self.pool.clear()
+        self.stats.clear()
+        self.started.clear()
+        self.last_seen.clear()
+        self.paused.clear()
+
+    def _shutdown(self, workers: list, timeout: float):
+        """Signal all workers at once, wait for them against one deadline, then terminate the rest"""
+        for process, _, pipe in workers:
+            if process.is_alive():
+                try:
+                    pipe.send("stop")
+                except OSError:
+                    pass
+        pending = {process.sentinel: process for process, _, _ in workers if process.is_alive()}
+        deadline = time.monotonic() + timeout
+        while pending and (remaining := deadline - time.monotonic()) > 0:
+            for sentinel in wait_processes(list(pending), remaining):
+                del pending[sentinel]
+        if pending:
+            print(f"[STREAM] terminating {len(pending)} worker(s) after {timeout:.1f} s")
+            for process in pending.values():
+                process.terminate()
+            wait_processes(list(pending), KILL_TIMEOUT)
+            for process in pending.values():
+                if process.is_alive():
+                    process.kill()
+        for worker in workers:
+            worker[0].join(timeout=0.1)
+            self._release(worker)
+
+    @staticmethod
+    def _release(worker):
+        _, image_queue, pipe = worker
+        # Сервер только читает очередь, поток-писатель у него не запущен - join_thread не блокирует
+        image_queue.close()
+        image_queue.join_thread()
+        pipe.close()
 
     def _poll_all(self):
         self._poll_frames()
@@ -188,119 +484,154 @@ class VideoProcessController(QObject):
             try:
                 msg = image_queue.get_nowait()
                 if msg["type"] == "frame":
-                    self.frame_ready.emit(device_id, msg["data"])
+                    stage_timer(device_id).since("queue_transit", msg.get("queued", 0.0))
+                    if is_sampled(msg.get("ts", 0.0)):
+                        TRACER.complete("transfer", msg["queued"], time.time(), device=device_id)
+                    self.polled[device_id] = self.polled.get(device_id, 0) + 1
+                    self.last_seen[device_id] = time.monotonic()
+                    self.frame_ready.emit(device_id, msg["data"], msg.get("ts", 0.0))
             except queue.Empty:
                 continue
 
     def _poll_events(self):
         for device_id, (_, _, pipe) in self.workers.items():
             while pipe.poll():
-                event = pipe.recv()
-                event_type = event.get("type")
+                try:
+                    event = pipe.recv()
+                except (EOFError, OSError):
+                    break
+                if event.get("type") == "trace":
+                    TRACER.merge_remote(device_id, event["content"])
+                    continue
+                if event.get("type") == "stats":
+                    stages = event["content"].pop("stages", None)
+                    if stages:
+                        instrumentation.REGISTRY.merge_remote(device_id, stages)
+                    self.stats[device_id] = event["content"]
+                    self.last_seen[device_id] = time.monotonic()
+                    continue
+                event_type = event.get("event", event.get("type"))
                 msg = event.get("msg", "")
                 self.event_received.emit(device_id, event_type, msg)
 
 
 class ProcessingController(QObject):
-    overlay_ready = pyqtSignal(str, object)  # device_id, overlay frame
+    overlay_ready = pyqtSignal(str, object, float)  # device_id, overlay frame, capture timestamp
     processing_settings_changed = pyqtSignal(str, dict)  # device_id, ProcessingSettings as dict
     alert_zones_changed = pyqtSignal(str, list)  # device_id, list of zones as dicts
     temperature_changed = pyqtSignal(str, list)  # device_id, list of temperature as dicts
+    frame_processed = pyqtSignal(str, float)  # device_id, processing time in seconds
+    frame_latency = pyqtSignal(str, float)  # device_id, capture-to-overlay latency in seconds
 
     def __init__(self, model: Esp32Manager):
         super().__init__()
-        self.latest_matrix: dict[str, np.ndarray] = {}
+        self.store = ThermalStore()
+        self.history = ThermalHistory()
+        self.rollups = RollupStore(history=self.history)
+        self.thumbnails = ThumbnailCache()
 
-        self.min = 100
-        self.max = -10
         self.model = model
         self.settings = {dev.id: dev.processing_settings for dev in self.model.get_all()}
+        self.pipelines = {dev.id: ProcessingPipeline(dev.processing_settings) for dev in self.model.get_all()}
+        for dev in self.model.get_all():
+            self.store.configure(dev.id, dev.processing_settings)
         self.processing_settings_changed.connect(self._update_local_settings)
         self.alert_zones = {dev.id: dev.alert_zones for dev in self.model.get_all()}
         self.alert_zones_changed.connect(self._update_local_zones)
-        self.old_data = np.zeros((8, 8), dtype=np.float32)
+        self.alerts = AlertEngine()
+        self.zone_samplers: dict[str, ZoneSampler] = {}
+        for dev in self.model.get_all():
+            self.alerts.set_zones(dev.id, dev.alert_zones)
 
         self.shape = (640, 480)
-
-        self.str2heatmap = {
-            "hsv": cv2.COLORMAP_HSV,
-            "hot": cv2.COLORMAP_HOT,
-            "jet": cv2.COLORMAP_JET,
-            "inferno": cv2.COLORMAP_INFERNO
-        }
+        # Счетчики для метрик: читаются из другого потока, только растут
+        self.processed: dict[str, int] = {}
+        self.zone_eval_seconds = 0.0
+        self.zone_eval_count = 0
 
     def _update_local_zones(self, device_id, zones):
         device = self.model.get_device(device_id)
         if device:
             self.alert_zones[device_id] = device.alert_zones
+            self.alerts.set_zones(device_id, device.alert_zones)
+            self.zone_samplers.pop(device_id, None)
 
     def _update_local_settings(self, device_id, settings):
         device = self.model.get_device(device_id)
-        if device:
+        # Активация камеры тоже присылает настройки - без изменений пайплайн (EMA диапазона, буферы) не трогаем
+        if device and self.settings.get(device_id) != device.processing_settings:
             self.settings[device_id] = device.processing_settings
+            self.pipelines[device_id] = ProcessingPipeline(device.processing_settings)
+            self.store.configure(device_id, device.processing_settings)
+            self.zone_samplers.pop(device_id, None)
 
-    def update_matrix(self, device_id: str, matrix: list[list[float]]):
-        new_data = np.flipud(np.array(matrix, dtype=np.float32).T)
-
-        if device_id not in self.latest_matrix:
-            self.latest_matrix[device_id] = new_data
-        else:
-            self.latest_matrix[device_id] = (
-                    0.8 * self.latest_matrix[device_id] + 0.2 * new_data
-            )
-        if self.alert_zones.get(device_id):
-            self.temperature_changed.emit(device_id, self.update_temperature(device_id, self.latest_matrix[device_id]))
-
-    def update_temperature(self, device_id: str, matrix):
-        upscaled_matrix = cv2.resize(matrix, self.shape, interpolation=cv2.INTER_CUBIC)
-        temperatures = []
-        for zone in self.alert_zones[device_id]:
-            if zone.enabled:
-                if zone.type == "point":
-                    temperatures.append(self.get_point_temperature(self.shape, zone, upscaled_matrix))
-                else:
-                    temperatures.append(self.get_area_temperature(self.shape, zone, upscaled_matrix))
+    def release_device(self, device_id: str):
+        self.store.release(device_id)
+        self.zone_samplers.pop(device_id, None)
 
-        return temperatures
+    def _compile_pipeline(self, device_id):
+        device = self.model.get_device(device_id)
+        settings = device.processing_settings if device else ProcessingSettings()
+        self.settings[device_id] = settings
+        self.pipelines[device_id] = ProcessingPipeline(settings)
+        return self.pipelines[device_id]
 
-    def handle_frame(self, device_id: str, frame):
-        if device_id not in self.latest_matrix:
+    def update_matrix(self, device_id: str, matrix: list[list[float]]):
+        self.update_matrices([device_id], np.array(matrix, dtype=np.float32)[None])
+
+    def update_matrices(self, device_ids: list[str], matrices: np.ndarray, received: float | None = None):
+        received = time.time() if received is None else received
+        # [B, 8, 8] в порядке датчика -> ориентация кадра, сразу для всей пачки
+        frames = np.flip(matrices.transpose(0, 2, 1), axis=1)
+        self.history.append_batch(device_ids, frames, received)
+        self.store.update_batch(device_ids, frames, received)
+
+        zone_stats = {}
+        for device_id in dict.fromkeys(device_ids):
+            if self.alert_zones.get(device_id):
+                zone_start = time.perf_counter()
+                points = self.update_temperature(device_id, self.store.get(device_id))
+                self.zone_eval_seconds += time.perf_counter() - zone_start
+                self.zone_eval_count += 1
+                zone_stats[device_id] = points
+                self.alerts.update(device_id, [point.temperature for point in points], received)
+                self.temperature_changed.emit(device_id, points)
+        for device_id, frame in zip(device_ids, frames):
+            points = zone_stats.get(device_id, ())
+            self.rollups.add(device_id, received, frame,
+                             [point.min for point in points],
+                             [point.temperature for point in points],
+                             [point.mean for point in points])
+        self.alerts.evaluate()
+
+    def update_temperature(self, device_id: str, matrix) -> list[ZonePoint]:
+        sampler = self.zone_samplers.get(device_id)
+        if sampler is None:
+            settings = self.settings.get(device_id) or ProcessingSettings()
+            sampler = ZoneSampler(self.alert_zones.get(device_id, []), settings.zone_percentile)
+            self.zone_samplers[device_id] = sampler
+        return sampler.evaluate(matrix)
+
+    def handle_frame(self, device_id: str, frame, captured: float = 0.0):
+        matrix = self.store.get(device_id)
+        if matrix is None:
             return  # нет матрицы — нечего обрабатывать
+        start = time.perf_counter()
+        timer = stage_timer(device_id)
+        timer.since("capture_to_processing", captured)
         self.shape = (frame.shape[1], frame.shape[0])
-        matrix = self.latest_matrix[device_id]
-        heatmap_colormap = self.str2heatmap[self.settings[device_id].heatmap_colormap]
-        heatmap = self.create_heatmap(matrix, frame.shape, heatmap_colormap)
-        processed_frame = frame
-        if self.settings[device_id].video_filter == "gray":
-            processed_frame = cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
-        if self.settings[device_id].video_filter == "edges":
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-            sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-            sobel = cv2.magnitude(sobelx, sobely)
-            sobel = cv2.convertScaleAbs(sobel)
-
-            processed_frame = cv2.cvtColor(sobel, cv2.COLOR_GRAY2BGR)
-
-        overlay = cv2.addWeighted(processed_frame, 1, heatmap, self.settings[device_id].thermo_alpha / 100, 0)
-
-        if self.settings[device_id].overlay_mode == "both":
-            overlay = cv2.addWeighted(processed_frame, 1, heatmap, self.settings[device_id].thermo_alpha / 100, 0)
-        if self.settings[device_id].overlay_mode == "thermal":
-            overlay = heatmap
-        if self.settings[device_id].overlay_mode == "video":
-            overlay = processed_frame
-
-        self.overlay_ready.emit(device_id, overlay)
-
-    def create_heatmap(self, data, frame_shape, heatmap_colormap):
-
-        heatmap = cv2.resize(data, (frame_shape[1], frame_shape[0]), interpolation=cv2.INTER_CUBIC)
-        self.min = heatmap.min() if heatmap.min() < self.min else self.min
-        self.max = heatmap.max() if heatmap.max() > self.min else self.max
-
-        heatmap = np.uint8(255 * (heatmap - self.min) / (self.max - self.min + 1e-5))
-        return cv2.applyColorMap(heatmap, heatmap_colormap)
+        pipeline = self.pipelines.get(device_id)
+        if pipeline is None:
+            pipeline = self._compile_pipeline(device_id)
+        with span("process", captured, device=device_id):
+            overlay = pipeline.process(frame, matrix, timer)
+
+        self.processed[device_id] = self.processed.get(device_id, 0) + 1
+        self.thumbnails.update(device_id, overlay)
+        self.overlay_ready.emit(device_id, overlay, captured)
+        self.frame_processed.emit(device_id, time.perf_counter() - start)
+        if captured:
+            self.frame_latency.emit(device_id, time.time() - captured)
 
     def apply_overlay(self, device_id, frame, heatmap):
 
@@ -313,49 +644,3 @@ class ProcessingController(QObject):
 
 
         return frame
-
-    def get_point_temperature(self, shape, zone: AlertZone, heatmap):
-        # Нарисовать точку
-        point = transform_coords_f2i(zone.coords[0], shape[0], shape[1])
-        point = (int(point.x()), int(point.y()))  # Преобразуем в (x, y)
-        zone.temperature = heatmap[point[1]][point[0]]
-        return ZonePoint(point=zone.coords[0], temperature=zone.temperature)
-
-    def get_area_temperature(self, shape, zone: AlertZone, heatmap):
-        def get_bounding_box(polygon):
-
-            min_x = min(polygon, key=lambda p: p[0])[0]
-            max_x = max(polygon, key=lambda p: p[0])[0]
-            min_y = min(polygon, key=lambda p: p[1])[1]
-            max_y = max(polygon, key=lambda p: p[1])[1]
-            return (min_x, min_y, max_x, max_y)
-
-
-        points = [transform_coords_f2i(p, shape[0], shape[1]) for p in zone.coords]
-        points = [(int(p.x()), int(p.y())) for p in points]
-
-
-        mask = np.zeros(shape=(shape[1], shape[0]), dtype=np.uint8)  # Маска для полигональной области
-        cv2.fillPoly(mask, [np.array(points, np.int32)], 255)
-
-        min_x, min_y, max_x, max_y = get_bounding_box(points)
-        max_temp = -float('inf')
-        hottest_point = (0, 0)
-
-        for y in range(min_y, min(max_y + 1, shape[1]), 2):
-            for x in range(min_x, min(max_x + 1, shape[0]), 2):
-                # Проверка, внутри ли пиксель полигона (с помощью маски)
-                if mask[y][x] == 255:
-
-                    temp = heatmap[y][x]
-
-
-                    if temp > max_temp:
-                        max_temp = temp
-                        hottest_point = (x, y)
-
-
-        if hottest_point:
-            zone.temperature = max_temp
-            hottest_point_norm = transform_coords_i2f(QPointF(hottest_point[0], hottest_point[1]), shape[0], shape[1])
-        return ZonePoint(point=hottest_point_norm, temperature=zone.temperature)
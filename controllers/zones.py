@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+
+import numpy as np
+from PyQt6.QtCore import QPointF
+
+from models.model import AlertZone
+from views.AlertsEditorOverlay import transform_coords_f2i, transform_coords_i2f
+
+ZONE_GRID = (160, 120)  # (w, h) сетка, на которой оцениваются зоны
+
+
+@dataclass
+class ZonePoint:
+    point: QPointF = QPointF()
+    temperature: float = 0  # максимум зоны
+    min: float = 0
+    mean: float = 0
+    percentile: float = 0
+    above_fraction: float = 0  # доля площади выше порога
+
+
+class ZoneSampler:
+    """Cached masks of a device's enabled zones, evaluated together in one pass"""
+
+    def __init__(self, zones: list[AlertZone], percentile: float, grid: tuple[int, int] = ZONE_GRID):
+        self.grid = grid
+        self.percentile = percentile
+        self.zones = [zone for zone in zones if zone.enabled]
+        # cv2 грузится при первой обработке, а не при импорте окна (ZonePoint нужен view)
+        import cv2
+
+        width, height = grid
+        indices = []
+        for zone in self.zones:
+            if zone.type == "point":
+                point = transform_coords_f2i(zone.coords[0], width, height)
+                x = min(max(int(point.x()), 0), width - 1)
+                y = min(max(int(point.y()), 0), height - 1)
+                indices.append(np.array([y * width + x]))
+            else:
+                points = [transform_coords_f2i(p, width, height) for p in zone.coords]
+                polygon = np.array([(int(p.x()), int(p.y())) for p in points], np.int32)
+                mask = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(mask, [polygon], 255)
+                zone_indices = np.flatnonzero(mask)
+                if not len(zone_indices):
+                    # Вырожденный полигон - берем его центр
+                    x, y = np.clip(polygon.mean(axis=0).astype(int), 0, (width - 1, height - 1))
+                    zone_indices = np.array([y * width + x])
+                indices.append(zone_indices)
+
+        self.lengths = np.array([len(i) for i in indices], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype(np.int64)
+        self.indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        self.segments = np.repeat(np.arange(len(self.zones)), self.lengths)
+        self.thresholds = np.array([zone.threshold for zone in self.zones], dtype=np.float32)[self.segments]
+
+        self.upscaled = np.empty((height, width), dtype=np.float32)
+
+    def evaluate(self, matrix) -> list[ZonePoint]:
+        if not self.zones:
+            return []
+        import cv2
+        width, height = self.grid
+        cv2.resize(matrix, self.grid, dst=self.upscaled, interpolation=cv2.INTER_CUBIC)
+        values = self.upscaled.ravel()[self.indices]
+
+        # Сортировка внутри зон: минимум, максимум и перцентиль берутся по позициям
+        order = np.lexsort((values, self.segments))
+        ordered = values[order]
+        first = self.offsets
+        last = self.offsets + self.lengths - 1
+
+        rank = first + (self.lengths - 1) * self.percentile / 100
+        low = np.floor(rank).astype(np.int64)
+        high = np.ceil(rank).astype(np.int64)
+        percentile = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+        means = np.add.reduceat(values, self.offsets) / self.lengths
+        above = np.add.reduceat(values >= self.thresholds, self.offsets) / self.lengths
+        hottest = self.indices[order[last]]
+
+        result = []
+        for i, zone in enumerate(self.zones):
+            if zone.type == "point":
+                point = zone.coords[0]
+            else:
+                y, x = divmod(int(hottest[i]), width)
+                point = transform_coords_i2f(QPointF(x, y), width, height)
+            result.append(ZonePoint(point=point, temperature=float(ordered[last[i]]), min=float(ordered[first[i]]),
+                                    mean=float(means[i]), percentile=float(percentile[i]),
+                                    above_fraction=float(above[i])))
+        return result
@@ -1,32 +1,109 @@
 import sys
+import argparse
+import signal
+import time
 from PyQt6.QtWidgets import QApplication
-from controllers.controller import  DeviceManager,GuiController
-from controllers.network import ZeroconfService, MqttController
+from PyQt6.QtCore import QTimer
 from views.view import MainWindow
-from models.model import Esp32Device,Esp32Manager
 
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Thermo camera server")
+    parser.add_argument("--capture", metavar="DIR", help="записать входящие MQTT и MJPEG в каталог")
+    parser.add_argument("--replay", metavar="DIR", help="воспроизвести записанную сессию вместо сети")
+    parser.add_argument("--speed", type=float, default=1.0, help="скорость воспроизведения, 0 - максимально быстро")
+    parser.add_argument("--metrics-port", type=int, help="отдавать метрики Prometheus на 127.0.0.1:PORT/metrics")
+    parser.add_argument("--exit-after-startup", action="store_true", help="выйти после запуска (бенчмарк старта)")
+    args, _ = parser.parse_known_args()
+    return args
+
 
-    # Model
-    mdns = ZeroconfService()
-    mdns.start()
+def start_services(args, app: QApplication, view: MainWindow) -> dict:
+    """Second startup stage, run once the window is on screen: processing, network, restore"""
+    # cv2, paho и zeroconf грузятся здесь, а не до первой отрисовки окна
+    from controllers.controller import DeviceManager, GuiController
+    from controllers.network import ZeroconfService, MqttController
+    from controllers.metrics import MetricsServer
+    from controllers.replay import SessionCapture, MqttReplay, OfflineMqtt, captured_devices, replay_url
+    from models.model import Esp32Manager
 
+    services = {}
     devices = Esp32Manager.load_devices()
 
     model = Esp32Manager()
     model.devices = devices
     model.save_devices()
-    view = MainWindow()
-    mqtt = MqttController(broker_host="192.168.0.5", broker_port=1883)
-    mqtt.start()
+    if args.replay:
+        mqtt = OfflineMqtt()
+    else:
+        mqtt = MqttController(broker_host="192.168.0.5", broker_port=1883)
     device_manager = DeviceManager(model, mqtt)
     controller = GuiController(model, view, device_manager)
+    services.update(model=model, mqtt=mqtt, device_manager=device_manager, controller=controller)
 
     mqtt.mqtt_message_recieved.connect(device_manager.handle_mqtt)
 
-    # Запуск
+    if args.capture:
+        capture = SessionCapture(args.capture)
+        mqtt.capture = capture
+        device_manager.streams.capture = capture
+        app.aboutToQuit.connect(capture.close)
+
+    # Сеть: соединение с брокером и регистрация mDNS идут в фоновых потоках
+    mqtt.start()
+    if not args.replay:
+        mdns = ZeroconfService()
+        mdns.start()
+        app.aboutToQuit.connect(mdns.stop)
+        services["mdns"] = mdns
+
+    if args.replay:
+        replay = MqttReplay(args.replay, device_manager.handle_mqtt, args.speed)
+        replay_start = time.time()
+        for device_id in captured_devices(args.replay):
+            device_manager.streams.video_sources[device_id] = replay_url(
+                args.replay, device_id, replay.origin, replay_start, args.speed)
+        replay.finished.connect(lambda: print(f"[REPLAY] {replay.delivered} messages in "
+                                              f"{time.time() - replay_start:.2f} s"))
+        replay.begin(replay_start)
+        services["replay"] = replay
+
+    if args.metrics_port:
+        metrics = MetricsServer(device_manager, view, port=args.metrics_port)
+        metrics.start()
+        services["metrics"] = metrics
+
+    # Снимок трассы по SIGUSR1 (или F12 в окне)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: QTimer.singleShot(0, device_manager.dump_trace))
+
+    print(f"[STARTUP] services ready, cv2 loaded: {'cv2' in sys.modules}", flush=True)
+    if args.exit_after_startup:
+        QTimer.singleShot(0, lambda: shutdown(app, services))
+    return services
+
+
+def shutdown(app: QApplication, services: dict):
+    services["controller"].stop()
+    services["device_manager"].processing_thread.quit()
+    services["device_manager"].processing_thread.wait()
+    app.quit()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    app = QApplication(sys.argv)
+
+    # Запуск поэтапно: сначала окно, остальное - после его первой отрисовки
+    view = MainWindow()
+    services = {}
+
+    def on_first_paint():
+        print(f"[STARTUP] window shown, cv2 loaded: {'cv2' in sys.modules}", flush=True)
+        # Из paintEvent не грузимся: даем отрисовке завершиться и попасть на экран
+        QTimer.singleShot(0, lambda: services.update(start_services(args, app, view)))
+
+    view.first_painted.connect(on_first_paint)
     view.show()
 
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,214 @@
+# Генератор нагрузки: N виртуальных ESP32-CAM в одном процессе
+# python mocks/loadgen.py --cameras 100 --broker 127.0.0.1 --auto-start
+
+import argparse
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import paho.mqtt.client as mqtt
+
+MQTT_USERNAME = "rmuser"
+MQTT_PASSWORD = "pass"
+BOUNDARY = "frame"
+AMG8833_PAYLOAD_SIZE = 64 * 4
+
+
+def encode_sequence(count: int, width: int, height: int, quality: int) -> list[bytes]:
+    """JPEG frames encoded once up front and shared by every camera"""
+    frames = []
+    for i in range(count):
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        x = int((i / count) * (width - 80))
+        cv2.rectangle(frame, (x, height // 3), (x + 80, height // 3 + 80), (0, 128, 255), -1)
+        cv2.putText(frame, f"Frame {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(jpeg.tobytes())
+    return frames
+
+
+def generate_matrices(count: int, payload_size: int) -> list[bytes]:
+    """Thermal payloads with a moving hot spot; sizes other than 256 bytes test the server's rejection path"""
+    payloads = []
+    for i in range(count):
+        hotspot_x, hotspot_y = i % 8, (i // 8) % 8
+        distance = np.sqrt((np.arange(8)[None, :] - hotspot_x) ** 2 + (np.arange(8)[:, None] - hotspot_y) ** 2)
+        matrix = 35.0 - 15.0 * distance / distance.max()
+        payload = struct.pack("<64f", *matrix.astype(np.float32).ravel())
+        payloads.append((payload * (payload_size // len(payload) + 1))[:payload_size])
+    return payloads
+
+
+class VirtualCamera:
+    def __init__(self, device_id: str, host: str, port: int, args):
+        self.device_id = device_id
+        self.host = host
+        self.port = port
+        self.args = args
+        self.connected = False
+        self.active = False
+        self.frames_sent = 0
+        self.matrices_sent = 0
+        self.client = mqtt.Client(client_id=device_id, callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+        self.client.will_set(f"{device_id}/status", "offline", qos=1)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    @property
+    def discovery_payload(self) -> str:
+        return f"{self.device_id}:{self.host}:{self.port}"
+
+    def start(self):
+        self.client.connect_async(self.args.broker, self.args.broker_port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        if self.connected:
+            self.client.publish(f"{self.device_id}/status", "offline", qos=1)
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        client.subscribe(f"{self.device_id}/control")
+        client.subscribe("server/status")
+
+    def _on_message(self, client, userdata, message):
+        payload = message.payload.decode()
+        if message.topic == "server/status" and payload == "offline":
+            self.active = self.connected = False
+        elif message.topic == f"{self.device_id}/control":
+            if payload == "ack-connect":
+                self.connected = True
+                if self.args.auto_start:
+                    self._set_active(True)
+            elif payload == "start":
+                self._set_active(True)
+            elif payload == "stop":
+                self._set_active(False)
+
+    def _set_active(self, active: bool):
+        self.active = active
+        self.client.publish(f"{self.device_id}/status", "active" if active else "connected")
+
+
+def make_handler(camera: VirtualCamera, frames: list[bytes], fps: float):
+    class MjpegHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/mjpeg/1":
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.end_headers()
+            # Камеры сдвинуты по последовательности, чтобы кадры разных потоков отличались
+            index = camera.port % len(frames)
+            period = 1.0 / fps
+            due = time.monotonic()
+            try:
+                while True:
+                    jpeg = frames[index]
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                     f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+                    camera.frames_sent += 1
+                    index = (index + 1) % len(frames)
+                    due += period
+                    time.sleep(max(due - time.monotonic(), 0))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return MjpegHandler
+
+
+def publish_loop(cameras: list[VirtualCamera], matrices: list[bytes], rate: float, stop: threading.Event):
+    """One thread publishes matrices for every camera, spread evenly over the period"""
+    period = 1.0 / rate
+    step = period / max(len(cameras), 1)
+    tick = 0
+    due = time.monotonic()
+    while not stop.is_set():
+        for camera in cameras:
+            if camera.active:
+                camera.client.publish(f"{camera.device_id}/amg8833", matrices[tick % len(matrices)])
+                camera.matrices_sent += 1
+            due += step
+            time.sleep(max(due - time.monotonic(), 0))
+        tick += 1
+
+
+def discovery_loop(cameras: list[VirtualCamera], stop: threading.Event):
+    while not stop.is_set():
+        for camera in cameras:
+            if camera.client.is_connected() and not camera.connected:
+                camera.client.publish("discovery", camera.discovery_payload)
+        stop.wait(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera ESP32-CAM load generator")
+    parser.add_argument("--cameras", type=int, default=10)
+    parser.add_argument("--broker", default="127.0.0.1")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--host", default="127.0.0.1", help="адрес MJPEG серверов, сообщается в discovery")
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--prefix", default="load")
+    parser.add_argument("--fps", type=float, default=25)
+    parser.add_argument("--resolution", default="640x480")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--sequence", type=int, default=50, help="число заранее закодированных кадров")
+    parser.add_argument("--matrix-rate", type=float, default=2, help="матриц в секунду на камеру")
+    parser.add_argument("--payload-size", type=int, default=AMG8833_PAYLOAD_SIZE)
+    parser.add_argument("--auto-start", action="store_true", help="начинать поток сразу после ack-connect")
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.split("x"))
+    frames = encode_sequence(args.sequence, width, height, args.quality)
+    matrices = generate_matrices(16, args.payload_size)
+    print(f"[LOAD] {len(frames)} frames, {sum(map(len, frames)) // len(frames)} B/frame, "
+          f"{args.cameras} cameras on {args.host}:{args.base_port}-{args.base_port + args.cameras - 1}")
+
+    cameras = []
+    servers = []
+    for i in range(args.cameras):
+        camera = VirtualCamera(f"{args.prefix}{i:03d}", args.host, args.base_port + i, args)
+        server = ThreadingHTTPServer((args.host, camera.port), make_handler(camera, frames, args.fps))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        camera.start()
+        cameras.append(camera)
+        servers.append(server)
+
+    stop = threading.Event()
+    threading.Thread(target=publish_loop, args=(cameras, matrices, args.matrix_rate, stop), daemon=True).start()
+    threading.Thread(target=discovery_loop, args=(cameras, stop), daemon=True).start()
+
+    try:
+        last_frames = 0
+        while True:
+            time.sleep(5)
+            sent = sum(camera.frames_sent for camera in cameras)
+            active = sum(camera.active for camera in cameras)
+            print(f"[LOAD] active {active}/{len(cameras)}, {(sent - last_frames) / 5:.0f} frames/s, "
+                  f"{sum(camera.matrices_sent for camera in cameras)} matrices")
+            last_frames = sent
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for camera in cameras:
+            camera.stop()
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from models.thermal_store import SENSOR_SHAPE
+
+CONTAINER_MAGIC = b"TCAMCLP1"
+META_HEADER = struct.Struct("<I")  # длина JSON с метаданными потоков
+CHUNK_HEADER = struct.Struct("<cdI")  # kind, capture timestamp, payload length
+CHUNK_JPEG = b"J"
+CHUNK_THERMAL = b"T"
+CHUNK_MQTT = b"M"  # topic \0 payload, для записи сессий
+CHUNK_KINDS = (CHUNK_JPEG, CHUNK_THERMAL, CHUNK_MQTT)
+FOOTER = struct.Struct("<QQ8s")  # index offset, index entries, magic
+FOOTER_MAGIC = b"TCAMIDX1"
+INDEX_RECORD = np.dtype([("ts", "<f8"), ("offset", "<u8"), ("size", "<u4"), ("kind", "S1")])
+THERMAL_DTYPE = np.dtype("<f4")
+
+
+class ContainerWriter:
+    """Appends JPEG and thermal chunks as they arrive; the time index is written on close"""
+
+    def __init__(self, path: str, **meta):
+        self.path = path
+        self.file = open(path, "wb")
+        meta = {"version": 1, "thermal_shape": list(SENSOR_SHAPE), "thermal_dtype": THERMAL_DTYPE.str, **meta}
+        encoded = json.dumps(meta).encode()
+        self.file.write(CONTAINER_MAGIC)
+        self.file.write(META_HEADER.pack(len(encoded)))
+        self.file.write(encoded)
+        # В памяти только записи индекса (21 байт на чанк), сами данные сразу уходят в файл
+        self.entries: list[tuple[float, int, int, bytes]] = []
+
+    def write(self, kind: bytes, ts: float, payload: bytes) -> int:
+        offset = self.file.tell()
+        self.file.write(CHUNK_HEADER.pack(kind, ts, len(payload)))
+        self.file.write(payload)
+        self.entries.append((ts, offset, len(payload), kind))
+        return offset
+
+    def write_jpeg(self, ts: float, jpeg: bytes) -> int:
+        return self.write(CHUNK_JPEG, ts, jpeg)
+
+    def write_thermal(self, ts: float, matrix: np.ndarray) -> int:
+        return self.write(CHUNK_THERMAL, ts, np.ascontiguousarray(matrix, dtype=THERMAL_DTYPE).tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        index = np.array(self.entries, dtype=INDEX_RECORD)
+        # Кадры и матрицы приходят из разных источников - упорядочиваем по времени захвата
+        index = index[np.argsort(index["ts"], kind="stable")]
+        offset = self.file.tell()
+        self.file.write(index.tobytes())
+        self.file.write(FOOTER.pack(offset, len(index), FOOTER_MAGIC))
+        self.file.close()
+
+
+class ContainerReader:
+    """Memory-mapped random access to a clip: O(log n) seek by capture time"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(CONTAINER_MAGIC)] != CONTAINER_MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a thermal clip")
+        position = len(CONTAINER_MAGIC)
+        (length,) = META_HEADER.unpack_from(self.map, position)
+        position += META_HEADER.size
+        self.meta = json.loads(self.map[position:position + length])
+        self.data_start = position + length
+        self.thermal_shape = tuple(self.meta.get("thermal_shape", SENSOR_SHAPE))
+
+        index = self._read_index()
+        if index is None:
+            # Запись оборвалась до индекса - восстанавливаем его проходом по чанкам
+            index = self._scan()
+        self.index = index
+        self.jpeg_index = index[index["kind"] == CHUNK_JPEG]
+        self.thermal_index = index[index["kind"] == CHUNK_THERMAL]
+
+    def _read_index(self) -> np.ndarray | None:
+        if len(self.map) < self.data_start + FOOTER.size:
+            return None
+        offset, count, magic = FOOTER.unpack_from(self.map, len(self.map) - FOOTER.size)
+        if magic != FOOTER_MAGIC or offset + count * INDEX_RECORD.itemsize != len(self.map) - FOOTER.size:
+            return None
+        return np.frombuffer(self.map, dtype=INDEX_RECORD, count=count, offset=offset)
+
+    def _scan(self) -> np.ndarray:
+        entries = []
+        position = self.data_start
+        while position + CHUNK_HEADER.size <= len(self.map):
+            kind, ts, size = CHUNK_HEADER.unpack_from(self.map, position)
+            if kind not in CHUNK_KINDS or position + CHUNK_HEADER.size + size > len(self.map):
+                break
+            entries.append((ts, position, size, kind))
+            position += CHUNK_HEADER.size + size
+        index = np.array(entries, dtype=INDEX_RECORD)
+        return index[np.argsort(index["ts"], kind="stable")]
+
+    @property
+    def start(self) -> float:
+        return float(self.index["ts"][0]) if len(self.index) else 0.0
+
+    @property
+    def end(self) -> float:
+        return float(self.index["ts"][-1]) if len(self.index) else 0.0
+
+    def seek(self, ts: float, index: np.ndarray | None = None) -> int:
+        """Position of the last chunk captured at or before ts (the first one if ts precedes the clip)"""
+        index = self.jpeg_index if index is None else index
+        position = int(np.searchsorted(index["ts"], ts, side="right")) - 1
+        return min(max(position, 0), len(index) - 1)
+
+    def payload(self, entry) -> memoryview:
+        start = int(entry["offset"]) + CHUNK_HEADER.size
+        return memoryview(self.map)[start:start + int(entry["size"])]
+
+    def jpeg(self, position: int) -> tuple[float, memoryview]:
+        entry = self.jpeg_index[position]
+        return float(entry["ts"]), self.payload(entry)
+
+    def thermal(self, position: int) -> tuple[float, np.ndarray]:
+        entry = self.thermal_index[position]
+        matrix = np.frombuffer(self.map, dtype=THERMAL_DTYPE, count=int(np.prod(self.thermal_shape)),
+                               offset=int(entry["offset"]) + CHUNK_HEADER.size)
+        return float(entry["ts"]), matrix.reshape(self.thermal_shape)
+
+    def at(self, ts: float) -> tuple[memoryview | None, np.ndarray | None]:
+        """JPEG frame and the thermal matrix that were current at ts"""
+        jpeg = self.jpeg(self.seek(ts))[1] if len(self.jpeg_index) else None
+        matrix = self.thermal(self.seek(ts, self.thermal_index))[1] if len(self.thermal_index) else None
+        return jpeg, matrix
+
+    def close(self):
+        self.index = self.jpeg_index = self.thermal_index = None
+        try:
+            self.map.close()
+        except BufferError:
+            # Снаружи ещё живут представления кадров - отображение закроется вместе с ними
+            pass
+        self.file.close()
+
+
+def is_container(path: str) -> bool:
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(CONTAINER_MAGIC)) == CONTAINER_MAGIC
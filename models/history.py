@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+from models.thermal_store import SENSOR_SHAPE
+
+HISTORY_DIR = "history"
+HISTORY_SLOTS = 2 * 60 * 60 * 24  # сутки при 2 Гц
+HISTORY_RECORD = np.dtype([("ts", "<f8"), ("seq", "<u8"), ("frame", "<f2", SENSOR_SHAPE)])
+
+
+class MappedRing:
+    """Fixed-size ring of structured records stored in a memory-mapped .npy file"""
+
+    def __init__(self, path: str, dtype: np.dtype, slots: int):
+        self.path = path
+        self.data = None
+        if os.path.exists(path):
+            data = np.load(path, mmap_mode="r+")
+            if data.dtype == dtype and data.shape == (slots,):
+                self.data = data
+        if self.data is None:
+            self.data = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(slots,))
+
+        # Голова восстанавливается по максимальному seq, отдельный заголовок не нужен
+        seq = self.data["seq"]
+        last = int(np.argmax(seq))
+        self.next_seq = int(seq[last]) + 1
+        self.head = (last + 1) % slots if seq[last] else 0
+        self.count = int(np.count_nonzero(seq))
+
+    @property
+    def slots(self) -> int:
+        return len(self.data)
+
+    def append(self, ts: float, **fields) -> int:
+        slot = self.head
+        record = self.data[slot]
+        for name, value in fields.items():
+            record[name] = value
+        record["ts"] = ts
+        record["seq"] = self.next_seq
+        self.next_seq += 1
+        self.head = (slot + 1) % self.slots
+        self.count = min(self.count + 1, self.slots)
+        return slot
+
+    def runs(self) -> list[np.ndarray]:
+        """Contiguous runs of records in time order, as views of the mapped file"""
+        if self.count < self.slots:
+            return [self.data[:self.head]]
+        return [self.data[self.head:], self.data[:self.head]]
+
+    def range(self, start: float, end: float) -> list[np.ndarray]:
+        views = []
+        for run in self.runs():
+            if not len(run):
+                continue
+            ts = run["ts"]
+            first, last = np.searchsorted(ts, start, side="left"), np.searchsorted(ts, end, side="right")
+            if first < last:
+                views.append(run[first:last])
+        return views
+
+    def flush(self):
+        self.data.flush()
+
+
+class ThermalHistory:
+    """Per-device memory-mapped rings of raw AMG8833 frames"""
+
+    def __init__(self, directory: str = HISTORY_DIR, slots: int = HISTORY_SLOTS):
+        self.directory = directory
+        self.slots = slots
+        self.rings: dict[str, MappedRing] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def ring(self, device_id: str) -> MappedRing:
+        ring = self.rings.get(device_id)
+        if ring is None:
+            ring = MappedRing(os.path.join(self.directory, f"{device_id}.npy"), HISTORY_RECORD, self.slots)
+            self.rings[device_id] = ring
+        return ring
+
+    def append(self, device_id: str, ts: float, frame: np.ndarray) -> int:
+        return self.ring(device_id).append(ts, frame=frame)
+
+    def append_batch(self, device_ids: list[str], frames: np.ndarray, ts: float):
+        for device_id, frame in zip(device_ids, frames):
+            self.ring(device_id).append(ts, frame=frame)
+
+    def read(self, device_id: str, start: float, end: float) -> list[np.ndarray]:
+        """Records of [start, end] as at most two views into the ring file"""
+        if device_id not in self.rings and not os.path.exists(os.path.join(self.directory, f"{device_id}.npy")):
+            return []
+        return self.ring(device_id).range(start, end)
+
+    def flush(self):
+        for ring in self.rings.values():
+            ring.flush()
@@ -0,0 +1,151 @@
+import bisect
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+JOURNAL_DIR = "journal"
+JOURNAL_SEGMENT_SIZE = 16 * 1024 * 1024
+JOURNAL_FSYNC_INTERVAL = 1.0  # секунды, group commit
+JOURNAL_QUEUE_MAXSIZE = 10000
+JOURNAL_BATCH_SIZE = 1000
+JOURNAL_INDEX_STRIDE = 64  # каждая N-я запись сегмента попадает в индекс
+
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+INDEX_ENTRY = struct.Struct("<dQ")  # timestamp, byte offset
+
+
+class EventJournal:
+    """Append-only JSONL journal with group commit, segment rotation and a sparse time index"""
+
+    def __init__(self, directory: str = JOURNAL_DIR, segment_size: int = JOURNAL_SEGMENT_SIZE,
+                 fsync_interval: float = JOURNAL_FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=JOURNAL_QUEUE_MAXSIZE)
+        self.thread: threading.Thread | None = None
+        self.running = False
+
+        self.segment = None
+        self.index = None
+        self.segment_records = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.commits = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout)
+
+    def record(self, kind: str, device_id: str, **data) -> bool:
+        """Never blocks: when the writer falls behind the record is dropped and counted"""
+        try:
+            self.queue.put_nowait({"ts": time.time(), "kind": kind, "device": device_id, **data})
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        last_commit = time.monotonic()
+        while self.running or not self.queue.empty():
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.fsync_interval))
+                while len(batch) < JOURNAL_BATCH_SIZE:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+            if self.segment and time.monotonic() - last_commit >= self.fsync_interval:
+                self._commit()
+                last_commit = time.monotonic()
+        self._close_segment()
+
+    def _write(self, batch: list[dict]):
+        if self.segment is None:
+            self._open_segment(batch[0]["ts"])
+        lines = []
+        index_entries = []
+        offset = self.segment.tell()
+        for record in batch:
+            line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode()
+            if self.segment_records % JOURNAL_INDEX_STRIDE == 0:
+                index_entries.append(INDEX_ENTRY.pack(record["ts"], offset))
+            lines.append(line)
+            offset += len(line)
+            self.segment_records += 1
+        self.segment.write(b"".join(lines))
+        if index_entries:
+            self.index.write(b"".join(index_entries))
+        self.written += len(batch)
+        if offset >= self.segment_size:
+            self._close_segment()
+
+    def _commit(self):
+        for file in (self.segment, self.index):
+            file.flush()
+            os.fsync(file.fileno())
+        self.commits += 1
+
+    def _open_segment(self, first_ts: float):
+        name = os.path.join(self.directory, f"{int(first_ts * 1000):013d}")
+        self.segment = open(name + SEGMENT_SUFFIX, "ab")
+        self.index = open(name + INDEX_SUFFIX, "ab")
+        self.segment_records = 0
+
+    def _close_segment(self):
+        if self.segment:
+            self._commit()
+            self.segment.close()
+            self.index.close()
+            self.segment = None
+            self.index = None
+
+    def segments(self) -> list[tuple[float, str]]:
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX))
+        return [(int(name[:-len(SEGMENT_SUFFIX)]) / 1000, os.path.join(self.directory, name)) for name in names]
+
+    def read(self, start: float, end: float):
+        """Records with start <= ts <= end, oldest first"""
+        segments = self.segments()
+        starts = [segment_start for segment_start, _ in segments]
+        first = max(bisect.bisect_right(starts, start) - 1, 0)
+        for segment_start, path in segments[first:]:
+            if segment_start > end:
+                break
+            with open(path, "rb") as f:
+                f.seek(self._seek_offset(path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, start))
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # недописанная последняя строка
+                    if record["ts"] > end:
+                        return
+                    if record["ts"] >= start:
+                        yield record
+
+    @staticmethod
+    def _seek_offset(index_path: str, start: float) -> int:
+        try:
+            with open(index_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        entries = [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size)]
+        position = bisect.bisect_left([ts for ts, _ in entries], start) - 1
+        return entries[position][1] if position >= 0 else 0
@@ -23,6 +23,7 @@ TRANSITIONS = {
     (DeviceState.AVAILABLE, DeviceState.ACTIVE): "activate",
     (DeviceState.ACTIVE, DeviceState.ERROR): "fail",
     (DeviceState.ERROR, DeviceState.OFFLINE): "reset",
+    (DeviceState.ERROR, DeviceState.ACTIVE): "recover",
 }
 
 
@@ -33,6 +34,15 @@ class ProcessingSettings:
     video_filter: str = "gray"
     filter_intensity: int = 100
     heatmap_colormap: str = "jet"
+    range_mode: str = "auto"  # "auto" - EMA of min/max, "fixed" - range_min..range_max
+    range_min: float = 20
+    range_max: float = 40
+    temporal_filter: str = "ema"  # "none", "ema", "median", "kalman"
+    filter_alpha: float = 0.2
+    median_window: int = 5
+    kalman_process_noise: float = 0.05
+    kalman_measurement_noise: float = 0.5
+    zone_percentile: float = 95
 
 
 @dataclass
@@ -42,6 +52,9 @@ class AlertZone:
     threshold: float = 50
     color: str = "red"
     enabled: bool = True
+    hysteresis: float = 2  # тревога снимается ниже threshold - hysteresis
+    min_duration: float = 0  # секунды, сколько условие должно держаться
+    rate_limit: float = 10  # секунды между повторными тревогами зоны
 
     #id: int = 0 # Поле не передается в __init__, но будет доступно
     #_id_counter: int = field(default=0, init=False, repr=False, compare=False)  # Счетчик (скрытый)
@@ -62,7 +75,7 @@ class Esp32Device:
     name: str = None
     state: DeviceState = DeviceState.OFFLINE
     # connected: bool = True
-    # active: bool = False
+    active: bool = False  # камера была на экране - восстанавливается при следующем запуске
     alert_zones: List[AlertZone] = field(default_factory=lambda: [AlertZone(type="global", enabled=False)])
     processing_settings: ProcessingSettings = field(default_factory=ProcessingSettings)
 
@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+
+from models.history import MappedRing, ThermalHistory
+from models.thermal_store import SENSOR_SHAPE
+
+ROLLUP_DIR = "rollups"
+MAX_ZONES = 16
+RAW_RESOLUTION = 0.5  # сырые кадры AMG8833, 2 Гц
+# (разрешение в секундах, число записей в кольце)
+ROLLUP_LEVELS = (
+    (10, 6 * 60 * 24),  # сутки
+    (60, 60 * 24 * 30),  # 30 дней
+    (3600, 24 * 365),  # год
+)
+ROLLUP_RECORD = np.dtype([
+    ("ts", "<f8"), ("seq", "<u8"), ("count", "<u4"),
+    ("partial", "u1"),  # корзина закрыта остановкой сервера, остаток интервала - следующей записью с тем же ts
+    ("pixel_min", "<f2", SENSOR_SHAPE), ("pixel_max", "<f2", SENSOR_SHAPE), ("pixel_mean", "<f2", SENSOR_SHAPE),
+    ("zone_min", "<f4", (MAX_ZONES,)), ("zone_max", "<f4", (MAX_ZONES,)), ("zone_mean", "<f4", (MAX_ZONES,)),
+])
+
+
+class RollupBucket:
+    """Streaming min/max/mean over one time bucket"""
+
+    def __init__(self, resolution: float):
+        self.resolution = resolution
+        self.start = None
+        self.count = 0
+        self.pixel_min = np.full(SENSOR_SHAPE, np.inf, dtype=np.float32)
+        self.pixel_max = np.full(SENSOR_SHAPE, -np.inf, dtype=np.float32)
+        self.pixel_sum = np.zeros(SENSOR_SHAPE, dtype=np.float64)
+        self.zone_min = np.full(MAX_ZONES, np.nan, dtype=np.float32)
+        self.zone_max = np.full(MAX_ZONES, np.nan, dtype=np.float32)
+        self.zone_sum = np.zeros(MAX_ZONES, dtype=np.float64)
+        self.zone_count = np.zeros(MAX_ZONES, dtype=np.int64)
+
+    def reset(self, start: float):
+        self.start = start
+        self.count = 0
+        self.pixel_min.fill(np.inf)
+        self.pixel_max.fill(-np.inf)
+        self.pixel_sum.fill(0)
+        self.zone_min.fill(np.nan)
+        self.zone_max.fill(np.nan)
+        self.zone_sum.fill(0)
+        self.zone_count.fill(0)
+
+    def add(self, count, pixel_min, pixel_max, pixel_sum, zone_min, zone_max, zone_sum, zone_count):
+        self.count += count
+        np.minimum(self.pixel_min, pixel_min, out=self.pixel_min)
+        np.maximum(self.pixel_max, pixel_max, out=self.pixel_max)
+        self.pixel_sum += pixel_sum
+        np.fmin(self.zone_min, zone_min, out=self.zone_min)
+        np.fmax(self.zone_max, zone_max, out=self.zone_max)
+        self.zone_sum += zone_sum
+        self.zone_count += zone_count
+
+    def add_bucket(self, other: "RollupBucket"):
+        self.add(other.count, other.pixel_min, other.pixel_max, other.pixel_sum,
+                 other.zone_min, other.zone_max, other.zone_sum, other.zone_count)
+
+    def record(self) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {"count": self.count,
+                    "pixel_min": self.pixel_min,
+                    "pixel_max": self.pixel_max,
+                    "pixel_mean": self.pixel_sum / max(self.count, 1),
+                    "zone_min": self.zone_min,
+                    "zone_max": self.zone_max,
+                    "zone_mean": np.where(self.zone_count > 0, self.zone_sum / self.zone_count, np.nan)}
+
+
+class DeviceRollups:
+    def __init__(self, directory: str, device_id: str):
+        self.buckets = [RollupBucket(resolution) for resolution, _ in ROLLUP_LEVELS]
+        self.rings = [MappedRing(os.path.join(directory, f"{device_id}.{resolution}s.npy"), ROLLUP_RECORD, slots)
+                      for resolution, slots in ROLLUP_LEVELS]
+        self._zone_values = np.full((3, MAX_ZONES), np.nan, dtype=np.float32)  # min, max, mean
+        self._zone_present = np.zeros(MAX_ZONES, dtype=np.int64)
+
+    def add(self, ts: float, frame: np.ndarray, zone_min=(), zone_max=(), zone_mean=()):
+        count = min(len(zone_max), MAX_ZONES)
+        zones = self._zone_values
+        zones.fill(np.nan)
+        zones[0, :count] = zone_min[:count]
+        zones[1, :count] = zone_max[:count]
+        zones[2, :count] = zone_mean[:count]
+        self._zone_present.fill(0)
+        self._zone_present[:count] = 1
+
+        self._roll(0, ts)
+        self.buckets[0].add(1, frame, frame, frame, zones[0], zones[1], np.nan_to_num(zones[2]), self._zone_present)
+
+    def _roll(self, level: int, ts: float):
+        # Закрываем корзину, если ts вышел за её границу, и сворачиваем её в следующий уровень
+        bucket = self.buckets[level]
+        start = ts - ts % bucket.resolution
+        if bucket.start == start:
+            return
+        if bucket.start is not None and bucket.count:
+            self.rings[level].append(bucket.start, partial=0, **bucket.record())
+            if level + 1 < len(self.buckets):
+                self._roll(level + 1, bucket.start)
+                self.buckets[level + 1].add_bucket(bucket)
+        bucket.reset(start)
+
+    def flush(self):
+        for ring in self.rings:
+            ring.flush()
+
+    def close(self):
+        """Append the open buckets as partial records, so a restart loses no aggregates"""
+        for level, bucket in enumerate(self.buckets):
+            if bucket.start is not None and bucket.count:
+                self.rings[level].append(bucket.start, partial=1, **bucket.record())
+                if level + 1 < len(self.buckets):
+                    self._roll(level + 1, bucket.start)
+                    self.buckets[level + 1].add_bucket(bucket)
+            bucket.reset(None)
+        self.flush()
+
+
+class RollupStore:
+    """Incremental 10 s / 1 min / 1 h rollups of per-pixel and per-zone min/max/mean"""
+
+    def __init__(self, directory: str = ROLLUP_DIR, history: ThermalHistory | None = None):
+        self.directory = directory
+        self.history = history
+        self.devices: dict[str, DeviceRollups] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def device(self, device_id: str) -> DeviceRollups:
+        rollups = self.devices.get(device_id)
+        if rollups is None:
+            rollups = DeviceRollups(self.directory, device_id)
+            self.devices[device_id] = rollups
+        return rollups
+
+    def add(self, device_id: str, ts: float, frame: np.ndarray, zone_min=(), zone_max=(), zone_mean=()):
+        self.device(device_id).add(ts, frame, zone_min, zone_max, zone_mean)
+
+    def query(self, device_id: str, start: float, end: float, max_points: int = 1000) -> tuple[float, list[np.ndarray]]:
+        """Finest resolution that covers [start, end] within max_points: (resolution, views of the ring)"""
+        span = end - start
+        if self.history and span / RAW_RESOLUTION <= max_points and span <= self.history.slots * RAW_RESOLUTION:
+            return RAW_RESOLUTION, self.history.read(device_id, start, end)
+
+        rollups = self.device(device_id)
+        for (resolution, slots), ring in zip(ROLLUP_LEVELS, rollups.rings):
+            oldest = ring.runs()[0]["ts"][:1]
+            covers = ring.count < ring.slots or (len(oldest) and oldest[0] <= start)
+            if span / resolution <= max_points and covers:
+                return resolution, ring.range(start, end)
+
+        resolution = ROLLUP_LEVELS[-1][0]
+        return resolution, rollups.rings[-1].range(start, end)
+
+    def flush(self):
+        for rollups in self.devices.values():
+            rollups.flush()
+
+    def close(self):
+        for rollups in self.devices.values():
+            rollups.close()
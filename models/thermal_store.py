@@ -0,0 +1,181 @@
+import time
+
+import numpy as np
+
+from models.model import ProcessingSettings
+
+SENSOR_SHAPE = (8, 8)
+INITIAL_CAPACITY = 16
+MAX_MEDIAN_WINDOW = 9
+
+FILTER_NONE = 0
+FILTER_EMA = 1
+FILTER_MEDIAN = 2
+FILTER_KALMAN = 3
+
+FILTER_KINDS = {
+    "none": FILTER_NONE,
+    "ema": FILTER_EMA,
+    "median": FILTER_MEDIAN,
+    "kalman": FILTER_KALMAN
+}
+
+
+class ThermalStore:
+    """Thermal state of all devices in one contiguous [N, H, W] float32 array"""
+
+    # Массивы, проиндексированные по слоту; растут вместе
+    SLOT_ARRAYS = ("frames", "seq", "timestamps", "filter_kind", "alpha", "median_window",
+                   "process_noise", "measurement_noise", "covariance", "history", "history_head", "history_count")
+
+    def __init__(self, shape: tuple[int, int] = SENSOR_SHAPE, capacity: int = INITIAL_CAPACITY):
+        self.shape = shape
+        defaults = ProcessingSettings()
+
+        self.frames = np.zeros((capacity, *shape), dtype=np.float32)
+        self.seq = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+
+        # Параметры временного фильтра по слотам
+        self.filter_kind = np.full(capacity, FILTER_KINDS[defaults.temporal_filter], dtype=np.int8)
+        self.alpha = np.full(capacity, defaults.filter_alpha, dtype=np.float32)
+        self.median_window = np.full(capacity, defaults.median_window, dtype=np.int64)
+        self.process_noise = np.full(capacity, defaults.kalman_process_noise, dtype=np.float32)
+        self.measurement_noise = np.full(capacity, defaults.kalman_measurement_noise, dtype=np.float32)
+        self.covariance = np.zeros((capacity, *shape), dtype=np.float32)
+        self.history = np.full((capacity, MAX_MEDIAN_WINDOW, *shape), np.nan, dtype=np.float32)
+        self.history_head = np.zeros(capacity, dtype=np.int64)
+        self.history_count = np.zeros(capacity, dtype=np.int64)
+
+        self.slots: dict[str, int] = {}
+        self.free: list[int] = list(range(capacity - 1, -1, -1))
+
+    @property
+    def capacity(self) -> int:
+        return len(self.seq)
+
+    def _grow(self):
+        old_capacity = self.capacity
+        new_capacity = old_capacity * 2
+        # Старые представления (get) остаются валидными - они ссылаются на прежний массив
+        for name in self.SLOT_ARRAYS:
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, array[:old_capacity]]))
+        self._reset(np.arange(old_capacity, new_capacity))
+        self.free.extend(range(new_capacity - 1, old_capacity - 1, -1))
+
+    def _reset(self, slots):
+        defaults = ProcessingSettings()
+        self.seq[slots] = 0
+        self.timestamps[slots] = 0
+        self.filter_kind[slots] = FILTER_KINDS[defaults.temporal_filter]
+        self.alpha[slots] = defaults.filter_alpha
+        self.median_window[slots] = defaults.median_window
+        self.process_noise[slots] = defaults.kalman_process_noise
+        self.measurement_noise[slots] = defaults.kalman_measurement_noise
+        self.history[slots] = np.nan
+        self.history_head[slots] = 0
+        self.history_count[slots] = 0
+
+    def slot(self, device_id: str) -> int:
+        slot = self.slots.get(device_id)
+        if slot is None:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.slots[device_id] = slot
+        return slot
+
+    def release(self, device_id: str):
+        slot = self.slots.pop(device_id, None)
+        if slot is not None:
+            self._reset(slot)
+            self.free.append(slot)
+
+    def configure(self, device_id: str, settings: ProcessingSettings):
+        slot = self.slot(device_id)
+        self.filter_kind[slot] = FILTER_KINDS.get(settings.temporal_filter, FILTER_EMA)
+        self.alpha[slot] = settings.filter_alpha
+        self.median_window[slot] = min(max(int(settings.median_window), 1), MAX_MEDIAN_WINDOW)
+        self.process_noise[slot] = settings.kalman_process_noise
+        self.measurement_noise[slot] = settings.kalman_measurement_noise
+        self.covariance[slot] = settings.kalman_measurement_noise
+
+    def __contains__(self, device_id: str) -> bool:
+        slot = self.slots.get(device_id)
+        return slot is not None and self.seq[slot] > 0
+
+    def get(self, device_id: str) -> np.ndarray | None:
+        slot = self.slots.get(device_id)
+        if slot is None or self.seq[slot] == 0:
+            return None
+        return self.frames[slot]
+
+    def update(self, device_id: str, frame: np.ndarray, timestamp: float | None = None) -> np.ndarray:
+        return self.update_batch([device_id], np.asarray(frame, dtype=np.float32)[None], timestamp)
+
+    def update_batch(self, device_ids: list[str], frames: np.ndarray, timestamp: float | None = None) -> np.ndarray:
+        """Filter a [B, H, W] batch into the slots of device_ids, returns the slot indices"""
+        if len(set(device_ids)) != len(device_ids):
+            # Несколько кадров одного устройства в пачке - применяем по порядку
+            return np.concatenate([self.update_batch([device_id], frames[i:i + 1], timestamp)
+                                   for i, device_id in enumerate(device_ids)])
+
+        timestamp = time.time() if timestamp is None else timestamp
+        idx = np.fromiter((self.slot(device_id) for device_id in device_ids), dtype=np.intp, count=len(device_ids))
+        frames = np.asarray(frames, dtype=np.float32)
+
+        head = self.history_head[idx]
+        self.history[idx, head] = frames
+        self.history_head[idx] = (head + 1) % MAX_MEDIAN_WINDOW
+        self.history_count[idx] = np.minimum(self.history_count[idx] + 1, MAX_MEDIAN_WINDOW)
+
+        filtered = frames.copy()
+        kinds = self.filter_kind[idx]
+        for kind in np.unique(kinds):
+            rows = np.flatnonzero(kinds == kind)
+            if kind == FILTER_EMA:
+                filtered[rows] = self._ema(idx[rows], frames[rows])
+            elif kind == FILTER_MEDIAN:
+                filtered[rows] = self._median(idx[rows])
+            elif kind == FILTER_KALMAN:
+                filtered[rows] = self._kalman(idx[rows], frames[rows])
+
+        fresh = self.seq[idx] == 0
+        filtered[fresh] = frames[fresh]
+        self.covariance[idx[fresh]] = self.measurement_noise[idx[fresh], None, None]
+
+        self.frames[idx] = filtered
+        self.seq[idx] += 1
+        self.timestamps[idx] = timestamp
+        return idx
+
+    def _ema(self, slots, frames):
+        current = self.frames[slots]
+        current += self.alpha[slots, None, None] * (frames - current)
+        return current
+
+    def _median(self, slots):
+        result = np.empty((len(slots), *self.shape), dtype=np.float32)
+        windows = self.median_window[slots]
+        for window in np.unique(windows):
+            rows = np.flatnonzero(windows == window)
+            group = slots[rows]
+            # Последние window значений кольца истории
+            offsets = np.arange(1, window + 1)
+            positions = (self.history_head[group, None] - offsets) % MAX_MEDIAN_WINDOW
+            samples = self.history[group[:, None], positions]
+            if np.all(self.history_count[group] >= window):
+                result[rows] = np.median(samples, axis=1)
+            else:
+                result[rows] = np.nanmedian(samples, axis=1)
+        return result
+
+    def _kalman(self, slots, frames):
+        # Скалярный фильтр Калмана для каждого пикселя, модель "случайное блуждание"
+        current = self.frames[slots]
+        covariance = self.covariance[slots] + self.process_noise[slots, None, None]
+        gain = covariance / (covariance + self.measurement_noise[slots, None, None])
+        current += gain * (frames - current)
+        self.covariance[slots] = (1 - gain) * covariance
+        return current
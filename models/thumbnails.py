@@ -0,0 +1,49 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+THUMBNAILS_DIR = "thumbnails"
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_INTERVAL = 10.0  # секунды между перезаписями кадра одной камеры
+THUMBNAIL_QUALITY = 80
+
+
+class ThumbnailCache:
+    """Last overlay frame of every camera, downscaled on disk and shown until the stream is back"""
+
+    def __init__(self, directory: str = THUMBNAILS_DIR, width: int = THUMBNAIL_WIDTH,
+                 interval: float = THUMBNAIL_INTERVAL):
+        self.directory = directory
+        self.width = width
+        self.interval = interval
+        self.saved: dict[str, float] = {}
+
+    def path(self, device_id: str) -> str:
+        return os.path.join(self.directory, f"{device_id}.jpg")
+
+    def update(self, device_id: str, frame: np.ndarray, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        if now - self.saved.get(device_id, 0.0) < self.interval:
+            return False
+        self.saved[device_id] = now
+        height, width = frame.shape[:2]
+        if width > self.width:
+            frame = cv2.resize(frame, (self.width, round(height * self.width / width)), interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+        if not ok:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        # Через временный файл: при падении на диске остается предыдущий целый кадр
+        path = self.path(device_id)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data.tobytes())
+        os.replace(path + ".tmp", path)
+        return True
+
+    def load(self, device_id: str) -> np.ndarray | None:
+        path = self.path(device_id)
+        if not os.path.exists(path):
+            return None
+        return cv2.imread(path, cv2.IMREAD_COLOR)
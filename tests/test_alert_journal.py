@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("PyQt6")
+pytest.importorskip("paho")
+
+from PyQt6.QtCore import QCoreApplication
+
+from controllers.alerts import ALERT_RAISED, ALERT_CLEARED
+from controllers.controller import DeviceManager
+from controllers.replay import OfflineMqtt
+from models.model import Esp32Manager, AlertZone
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    # Настройки, история и журнал пишутся в рабочий каталог
+    monkeypatch.chdir(tmp_path)
+    app = QCoreApplication.instance() or QCoreApplication([])
+    manager = DeviceManager(Esp32Manager(), OfflineMqtt())
+    yield manager
+    manager.stop_all()
+
+
+def test_alerts_reach_journal_and_mqtt(manager):
+    engine = manager.processor.alerts
+    engine.set_zones("cam1", [AlertZone(threshold=50, hysteresis=2, rate_limit=0)])
+    engine.update("cam1", [55.0], 1000.0)
+    engine.evaluate(1000.0)
+    engine.update("cam1", [40.0], 1001.0)
+    engine.evaluate(1001.0)
+    manager.journal.stop()
+
+    assert manager.mqtt.published == 2
+    assert manager.alert_counts == {("cam1", ALERT_RAISED): 1, ("cam1", ALERT_CLEARED): 1}
+    records = list(manager.journal.read(0, float("inf")))
+    assert [(record["kind"], record["device"], record["state"]) for record in records] == [
+        ("alert", "cam1", ALERT_RAISED), ("alert", "cam1", ALERT_CLEARED)]
+    assert records[0]["zone_index"] == 0
+    assert records[0]["temperature"] == 55.0
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("PyQt6")
+
+from controllers.alerts import AlertEngine, ALERT_RAISED, ALERT_CLEARED
+from models.model import AlertZone
+
+
+@pytest.fixture
+def engine():
+    engine = AlertEngine()
+    engine.events = []
+    engine.alert_raised.connect(engine.events.append)
+    engine.alert_cleared.connect(engine.events.append)
+    return engine
+
+
+def step(engine, device_id, temperatures, now):
+    engine.update(device_id, temperatures, now)
+    engine.evaluate(now)
+    events = [(event.device_id, event.zone_index, event.state) for event in engine.events]
+    engine.events.clear()
+    return events
+
+
+def test_clears_only_below_hysteresis(engine):
+    engine.set_zones("cam1", [AlertZone(threshold=50, hysteresis=2, rate_limit=0)])
+
+    assert step(engine, "cam1", [51.0], 0.0) == [("cam1", 0, ALERT_RAISED)]
+    # 49 ниже порога, но выше threshold - hysteresis: тревога держится
+    assert step(engine, "cam1", [49.0], 1.0) == []
+    assert step(engine, "cam1", [48.5], 2.0) == []
+    assert step(engine, "cam1", [47.9], 3.0) == [("cam1", 0, ALERT_CLEARED)]
+    assert engine.active_alerts("cam1") == []
+
+
+def test_min_duration_debounces_raise(engine):
+    engine.set_zones("cam1", [AlertZone(threshold=50, min_duration=1.0, rate_limit=0)])
+
+    assert step(engine, "cam1", [55.0], 0.0) == []
+    # Провал ниже порога сбрасывает отсчет
+    assert step(engine, "cam1", [40.0], 0.5) == []
+    assert step(engine, "cam1", [55.0], 0.8) == []
+    assert step(engine, "cam1", [55.0], 1.5) == []
+    assert step(engine, "cam1", [55.0], 1.8) == [("cam1", 0, ALERT_RAISED)]
+
+
+def test_rate_limit_delays_reraise(engine):
+    engine.set_zones("cam1", [AlertZone(threshold=50, hysteresis=2, rate_limit=10)])
+
+    assert step(engine, "cam1", [55.0], 0.0) == [("cam1", 0, ALERT_RAISED)]
+    assert step(engine, "cam1", [40.0], 1.0) == [("cam1", 0, ALERT_CLEARED)]
+    assert step(engine, "cam1", [55.0], 2.0) == []
+    assert step(engine, "cam1", [55.0], 9.9) == []
+    assert step(engine, "cam1", [55.0], 10.0) == [("cam1", 0, ALERT_RAISED)]
+
+
+def test_zone_change_resets_only_that_device(engine):
+    engine.set_zones("cam1", [AlertZone(threshold=50, rate_limit=0)])
+    engine.set_zones("cam2", [AlertZone(threshold=30, rate_limit=0), AlertZone(threshold=80, rate_limit=0)])
+    assert step(engine, "cam1", [55.0], 0.0) == [("cam1", 0, ALERT_RAISED)]
+    assert step(engine, "cam2", [35.0, 20.0], 0.0) == [("cam2", 0, ALERT_RAISED)]
+
+    # Новые зоны cam1: активная тревога снимается, строки cam2 сдвигаются
+    engine.set_zones("cam1", [AlertZone(threshold=60, rate_limit=0), AlertZone(threshold=40, rate_limit=0),
+                              AlertZone(enabled=False)])
+    assert [(event.device_id, event.state) for event in engine.events] == [("cam1", ALERT_CLEARED)]
+    engine.events.clear()
+    assert engine.threshold.tolist() == [60, 40, 30, 80]
+    assert engine.active_alerts("cam1") == []
+    assert engine.active_alerts("cam2") == [0]
+
+    # Состояние cam2 сохранено: повторной тревоги нет, а cam1 оценивается по новым порогам
+    assert step(engine, "cam2", [35.0, 20.0], 1.0) == []
+    assert step(engine, "cam1", [55.0, 55.0], 1.0) == [("cam1", 1, ALERT_RAISED)]
+
+    engine.remove_device("cam1")
+    assert [(event.device_id, event.zone_index, event.state) for event in engine.events] == [
+        ("cam1", 1, ALERT_CLEARED)]
+    assert engine.keys == [("cam2", 0), ("cam2", 1)]
+    assert engine.active_alerts("cam2") == [0]
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6")
+
+from models.rollups import RollupStore
+from models.thermal_store import SENSOR_SHAPE
+
+
+def test_open_buckets_survive_reopen(tmp_path):
+    store = RollupStore(str(tmp_path))
+    # 25 с по 2 Гц: две полные 10-секундные корзины и открытая третья
+    for i in range(50):
+        store.add("cam1", 1200.0 + i * 0.5, np.full(SENSOR_SHAPE, 20 + i, dtype=np.float32), [10.0], [30.0], [20.0])
+    store.close()
+
+    reopened = RollupStore(str(tmp_path))
+    resolution, views = reopened.query("cam1", 1200.0, 1230.0)
+    records = np.concatenate(views)
+    assert resolution == 10
+    assert records["ts"].tolist() == [1200.0, 1210.0, 1220.0]
+    assert records["count"].tolist() == [20, 20, 10]
+    assert records["partial"].tolist() == [0, 0, 1]
+    assert float(records["pixel_max"][-1].max()) == 69
+
+    # Минута и час тоже закрыты частично и содержат все 50 кадров
+    minute = np.concatenate(reopened.device("cam1").rings[1].range(0, 5000))
+    assert minute["count"].tolist() == [50]
+    assert minute["partial"].tolist() == [1]
@@ -0,0 +1,82 @@
+# Просмотр клипов событий: python -m tools.clip_player clips/<device>_<time>.tclip
+# Пробел - пауза, A/D - перемотка на SEEK_STEP секунд, Q/Esc - выход
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from controllers.pipeline import ProcessingPipeline
+from models.container import ContainerReader
+from models.model import ProcessingSettings
+
+SEEK_STEP = 5
+WINDOW_NAME = "Thermal clip"
+
+
+def render(reader: ContainerReader, pipeline: ProcessingPipeline, ts: float):
+    jpeg, matrix = reader.at(ts)
+    if jpeg is None:
+        return None
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None or matrix is None:
+        return frame
+    frame = pipeline.process(frame, matrix).copy()
+    cv2.putText(frame, f"{ts - reader.start:6.2f} / {reader.end - reader.start:.2f} s", (10, 25),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    return frame
+
+
+def play(path: str, speed: float = 1.0, start: float = 0.0):
+    reader = ContainerReader(path)
+    if not len(reader.jpeg_index):
+        print(f"[PLAYER] {path}: no video frames")
+        reader.close()
+        return
+    print(f"[PLAYER] {reader.meta.get('device_id', '?')}: {len(reader.jpeg_index)} frames, "
+          f"{len(reader.thermal_index)} thermal, {reader.end - reader.start:.1f} s")
+    pipeline = ProcessingPipeline(ProcessingSettings())
+    frame_ts = reader.jpeg_index["ts"]
+
+    position = reader.seek(reader.start + start)
+    paused = False
+    wall_start, clip_start = time.time(), float(frame_ts[position])
+    while True:
+        ts = float(frame_ts[position])
+        frame = render(reader, pipeline, ts)
+        if frame is not None:
+            cv2.imshow(WINDOW_NAME, frame)
+
+        if paused or position + 1 >= len(frame_ts):
+            delay = 0
+        else:
+            due = wall_start + (float(frame_ts[position + 1]) - clip_start) / speed
+            delay = max(int((due - time.time()) * 1000), 1)
+        key = cv2.waitKey(delay) & 0xFF
+
+        if key in (ord("q"), 27):
+            break
+        if key == ord(" "):
+            paused = not paused
+        elif key in (ord("a"), ord("d")):
+            step = SEEK_STEP if key == ord("d") else -SEEK_STEP
+            position = reader.seek(ts + step)
+        elif not paused and position + 1 < len(frame_ts):
+            position += 1
+        else:
+            paused = True
+            continue
+        wall_start, clip_start = time.time(), float(frame_ts[position])
+
+    cv2.destroyAllWindows()
+    reader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Thermal clip player")
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--start", type=float, default=0.0, help="offset from the clip start, s")
+    args = parser.parse_args()
+    play(args.path, args.speed, args.start)
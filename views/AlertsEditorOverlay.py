@@ -3,18 +3,25 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QGraphicsView, QGraphicsScene,
     QGraphicsPolygonItem, QGraphicsItem, QGraphicsEllipseItem,QGraphicsRectItem,
     QVBoxLayout, QHBoxLayout, QLabel, QSlider, QPushButton,
-    QFrame, QWidget, QSizePolicy, QGraphicsPathItem, QMenu, QDialog, QCheckBox, QGraphicsPixmapItem, QSplitter
+    QFrame, QWidget, QSizePolicy, QGraphicsPathItem, QMenu, QDialog, QCheckBox, QGraphicsPixmapItem, QSplitter,
+    QDoubleSpinBox
 )
 from PyQt6.QtCore import Qt, QPointF, QRectF, QPoint, QTimer, QLine
 from PyQt6.QtGui import (QColor, QPen, QPainter, QPolygonF, QBrush,
                          QPainterPath, QMouseEvent, QPixmap)
+from models.model import AlertZone
+
+# Параметры движка тревог в панели зоны: ключ AlertZone, подпись, единицы, максимум
+ALERT_OPTIONS = (("hysteresis", "Гистерезис:", " °C", 20),
+                 ("min_duration", "Держится не менее:", " с", 60),
+                 ("rate_limit", "Повтор не чаще:", " с", 600))
 
 
 class AlertPopupPanel(QDialog):
     def __init__(self, parent=None, item=None, threshold_value=None, is_active=True):
         super().__init__(parent)
         self.setWindowFlags(Qt.WindowType.Popup)
-        self.setFixedSize(200, 120)
+        self.setFixedSize(260, 230)
         self.current_item = item
 
         layout = QVBoxLayout()
@@ -23,6 +30,16 @@ class AlertPopupPanel(QDialog):
         self.slider.setRange(0, 100)
         self.slider.setValue(threshold_value)
 
+        self.option_boxes = {}
+        for key, label, suffix, maximum in ALERT_OPTIONS:
+            spin_box = QDoubleSpinBox()
+            spin_box.setRange(0, maximum)
+            spin_box.setDecimals(1)
+            spin_box.setSuffix(suffix)
+            spin_box.setValue(item.options.get(key, getattr(AlertZone, key)) if item else getattr(AlertZone, key))
+            spin_box.valueChanged.connect(lambda value, key=key: self.update_option(key, value))
+            self.option_boxes[key] = (QLabel(label), spin_box)
+
         self.is_active_chk = QCheckBox("Активен")
         if is_active:
             self.is_active_chk.setCheckState(Qt.CheckState.Checked)
@@ -32,6 +49,11 @@ class AlertPopupPanel(QDialog):
 
         layout.addWidget(self.threshold_label)
         layout.addWidget(self.slider)
+        for label, spin_box in self.option_boxes.values():
+            row = QHBoxLayout()
+            row.addWidget(label)
+            row.addWidget(spin_box)
+            layout.addLayout(row)
         layout.addWidget(self.is_active_chk)
         layout.addWidget(self.delete_btn)
         self.setLayout(layout)
@@ -53,6 +75,8 @@ class AlertPopupPanel(QDialog):
         self.current_item = item
         if item:
             self.slider.setValue(item.threshold)
+            for key, (_, spin_box) in self.option_boxes.items():
+                spin_box.setValue(item.options.get(key, getattr(AlertZone, key)))
 
     def delete_current_item(self):
         if self.current_item:
@@ -66,13 +90,18 @@ class AlertPopupPanel(QDialog):
         if self.current_item:
             self.current_item.threshold = value
 
+    def update_option(self, key, value):
+        if self.current_item:
+            self.current_item.options[key] = value
+
     def update_is_active(self):
         if self.current_item:
             self.current_item.is_active = self.is_active_chk.checkState() == Qt.CheckState.Checked
 
 class AlertGlobalItem(QGraphicsRectItem):
-    def __init__(self,threshold = 60, enabled = False):
+    def __init__(self,threshold = 60, enabled = False, **options):
         super().__init__(QRectF(0,0,200,200))
+        self.options = options  # параметры движка тревог (hysteresis, min_duration, rate_limit)
 
         self.id = id
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, False)
@@ -85,7 +114,8 @@ class AlertGlobalItem(QGraphicsRectItem):
         return {"coords": [QPointF(0,0),QPointF(0,1),QPointF(1,1),QPointF(1,0)],
                 "type": "global",
                 "enabled": self.is_active,
-                "threshold": self.threshold
+                "threshold": self.threshold,
+                **self.options
                 }
 
     def contextMenuEvent(self, event):
@@ -110,8 +140,9 @@ class AlertGlobalItem(QGraphicsRectItem):
         self.setPos(QPointF(0,0))
 
 class AlertPointItem(QGraphicsEllipseItem):
-    def __init__(self, coords=QPointF(), threshold=50, enabled=True):
+    def __init__(self, coords=QPointF(), threshold=50, enabled=True, **options):
         super().__init__(QRectF(-10, -10, 20, 20))
+        self.options = options
         self.setPos(coords)
         self.id = id
 
@@ -127,7 +158,8 @@ class AlertPointItem(QGraphicsEllipseItem):
         return {"coords": [transform_coords_i2f(self.pos(), width, height)],
                 "type": "point",
                 "enabled": self.is_active,
-                "threshold": self.threshold
+                "threshold": self.threshold,
+                **self.options
                 }
 
     def set_coords(self,coords, width, height):
@@ -164,8 +196,9 @@ class AlertPointItem(QGraphicsEllipseItem):
 
 
 class AlertPolygonItem(QGraphicsPolygonItem):
-    def __init__(self, coords=None, threshold=50, enabled=True):
+    def __init__(self, coords=None, threshold=50, enabled=True, **options):
         super().__init__()
+        self.options = options
         if coords is None:
             coords = [QPointF(0, 0), QPointF(100, 0), QPointF(100, 100), QPointF(0, 100)]
 
@@ -184,7 +217,8 @@ class AlertPolygonItem(QGraphicsPolygonItem):
         return {"coords": [transform_coords_i2f(point, width, height) for point in coords],
                 "type": "area",
                 "enabled": self.is_active,
-                "threshold": self.threshold
+                "threshold": self.threshold,
+                **self.options
                 }
 
     def set_coords(self,coords, width, height):
@@ -1,5 +1,6 @@
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QSlider, QComboBox, QPushButton, QHBoxLayout, QListWidget, \
-    QWidget, QAbstractItemView, QSizePolicy, QScrollArea, QLineEdit, QDialogButtonBox
+    QWidget, QAbstractItemView, QSizePolicy, QScrollArea, QLineEdit, QDialogButtonBox, QDoubleSpinBox, \
+    QSpinBox
 from PyQt6.QtCore import Qt, QSize, QObject
 from PyQt6.QtGui import QColor, QPainter
 
@@ -69,6 +70,23 @@ class ProcessingSettingsDialog(QDialog):
         self.heatmap_mode.addItem("Inferno", "inferno")
         layout.addWidget(self.heatmap_mode)
 
+        layout.addWidget(QLabel("Диапазон температур:"))
+        self.range_mode = QComboBox()
+        self.range_mode.addItem("Авто", "auto")
+        self.range_mode.addItem("Фиксированный", "fixed")
+        layout.addWidget(self.range_mode)
+
+        range_layout = QHBoxLayout()
+        self.range_min = QDoubleSpinBox()
+        self.range_max = QDoubleSpinBox()
+        for spin_box in (self.range_min, self.range_max):
+            spin_box.setRange(0, 80)
+            spin_box.setSuffix(" °C")
+            range_layout.addWidget(spin_box)
+        self.range_min.setValue(20)
+        self.range_max.setValue(40)
+        layout.addLayout(range_layout)
+
         layout.addWidget(QLabel("Фильтр видео:"))
         self.video_filter = QComboBox()
         self.video_filter.addItem("Ничего", "none")
@@ -89,6 +107,43 @@ class ProcessingSettingsDialog(QDialog):
         self.filter_slider.valueChanged.connect(lambda v: self.slider_changed(v, self.filter_value))
         layout.addLayout(filter_slider_layout)
 
+        layout.addWidget(QLabel("Временной фильтр тепловизора:"))
+        self.temporal_filter = QComboBox()
+        self.temporal_filter.addItem("Нет", "none")
+        self.temporal_filter.addItem("Экспоненциальное сглаживание", "ema")
+        self.temporal_filter.addItem("Медиана", "median")
+        self.temporal_filter.addItem("Фильтр Калмана", "kalman")
+        layout.addWidget(self.temporal_filter)
+
+        temporal_layout = QHBoxLayout()
+        self.filter_alpha = QDoubleSpinBox()
+        self.filter_alpha.setRange(0.01, 1)
+        self.filter_alpha.setSingleStep(0.05)
+        self.filter_alpha.setPrefix("α ")
+        temporal_layout.addWidget(self.filter_alpha)
+        self.median_window = QSpinBox()
+        self.median_window.setRange(1, 9)
+        self.median_window.setPrefix("N ")
+        temporal_layout.addWidget(self.median_window)
+        self.kalman_process_noise = QDoubleSpinBox()
+        self.kalman_process_noise.setRange(0.001, 10)
+        self.kalman_process_noise.setDecimals(3)
+        self.kalman_process_noise.setPrefix("Q ")
+        temporal_layout.addWidget(self.kalman_process_noise)
+        self.kalman_measurement_noise = QDoubleSpinBox()
+        self.kalman_measurement_noise.setRange(0.001, 10)
+        self.kalman_measurement_noise.setDecimals(3)
+        self.kalman_measurement_noise.setPrefix("R ")
+        temporal_layout.addWidget(self.kalman_measurement_noise)
+        layout.addLayout(temporal_layout)
+
+        layout.addWidget(QLabel("Перцентиль температуры зон:"))
+        self.zone_percentile = QSpinBox()
+        self.zone_percentile.setRange(1, 100)
+        self.zone_percentile.setSuffix(" %")
+        self.zone_percentile.setValue(95)
+        layout.addWidget(self.zone_percentile)
+
         self.button_box = QDialogButtonBox(
             QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel
         )
@@ -98,6 +153,8 @@ class ProcessingSettingsDialog(QDialog):
 
         self.setLayout(layout)
         self.video_filter.currentIndexChanged.connect(self.handle_filter_change)
+        self.range_mode.currentIndexChanged.connect(self.handle_range_mode_change)
+        self.temporal_filter.currentIndexChanged.connect(self.handle_temporal_filter_change)
 
     def load_values(self, settings: dict):
         self.overlay_mode.setCurrentIndex(self.overlay_mode.findData(settings["overlay_mode"]))
@@ -105,6 +162,17 @@ class ProcessingSettingsDialog(QDialog):
         self.video_filter.setCurrentIndex(self.video_filter.findData(settings["video_filter"]))
         self.filter_slider.setValue(settings["filter_intensity"])
         self.heatmap_mode.setCurrentIndex(self.heatmap_mode.findData(settings["heatmap_colormap"]))
+        self.range_mode.setCurrentIndex(self.range_mode.findData(settings["range_mode"]))
+        self.range_min.setValue(settings["range_min"])
+        self.range_max.setValue(settings["range_max"])
+        self.handle_range_mode_change(self.range_mode.currentIndex())
+        self.temporal_filter.setCurrentIndex(self.temporal_filter.findData(settings["temporal_filter"]))
+        self.filter_alpha.setValue(settings["filter_alpha"])
+        self.median_window.setValue(settings["median_window"])
+        self.kalman_process_noise.setValue(settings["kalman_process_noise"])
+        self.kalman_measurement_noise.setValue(settings["kalman_measurement_noise"])
+        self.handle_temporal_filter_change(self.temporal_filter.currentIndex())
+        self.zone_percentile.setValue(int(settings["zone_percentile"]))
 
     def export_values(self) -> dict:
         return {
@@ -112,7 +180,16 @@ class ProcessingSettingsDialog(QDialog):
             "thermo_alpha": self.alpha_slider.value(),
             "video_filter": self.video_filter.currentData(),
             "filter_intensity": self.filter_slider.value(),
-            "heatmap_colormap": self.heatmap_mode.currentData()
+            "heatmap_colormap": self.heatmap_mode.currentData(),
+            "range_mode": self.range_mode.currentData(),
+            "range_min": self.range_min.value(),
+            "range_max": max(self.range_max.value(), self.range_min.value() + 1),
+            "temporal_filter": self.temporal_filter.currentData(),
+            "filter_alpha": self.filter_alpha.value(),
+            "median_window": self.median_window.value(),
+            "kalman_process_noise": self.kalman_process_noise.value(),
+            "kalman_measurement_noise": self.kalman_measurement_noise.value(),
+            "zone_percentile": self.zone_percentile.value()
         }
 
     def slider_changed(self, value, item):
@@ -124,6 +201,18 @@ class ProcessingSettingsDialog(QDialog):
         else:
             self.filter_slider.setEnabled(True)
 
+    def handle_range_mode_change(self, index):
+        fixed = self.range_mode.currentData() == "fixed"
+        self.range_min.setEnabled(fixed)
+        self.range_max.setEnabled(fixed)
+
+    def handle_temporal_filter_change(self, index):
+        kind = self.temporal_filter.currentData()
+        self.filter_alpha.setEnabled(kind == "ema")
+        self.median_window.setEnabled(kind == "median")
+        self.kalman_process_noise.setEnabled(kind == "kalman")
+        self.kalman_measurement_noise.setEnabled(kind == "kalman")
+
 
 if __name__ == "__main__":
     import sys
@@ -11,7 +11,9 @@ from PyQt6.QtGui import QPixmap, QImage, QIcon, QPaintEvent, QPainter, QColor, Q
 from PyQt6.QtCore import Qt, QPointF
 from PyQt6.QtCore import QThread, pyqtSignal
 
-from controllers.video import ZonePoint
+from controllers.zones import ZonePoint
+from controllers.instrumentation import stage_timer
+from controllers.tracing import span
 from views.AlertsEditorOverlay import AlertsZonesEditor
 import math
 
@@ -28,6 +30,9 @@ class AlertZoneDTO:
     threshold: float = 50
     color: str = "red"
     enabled: bool = True
+    hysteresis: float = 2
+    min_duration: float = 0
+    rate_limit: float = 10
 
 @dataclass
 class WidgetAlertZone:
@@ -56,6 +61,7 @@ class CameraWidget(QLabel):
 
         self.cam_id = cam_id
         self.camera_name = camera_name
+        self.frames_displayed = 0
         self.expanded = False
 
         self.zones :List[WidgetAlertZone] = []
@@ -100,13 +106,19 @@ class CameraWidget(QLabel):
         if action_num == 3:
             # Логика удаления камеры
             pass
-    def update_frame(self, frame):
-        height, width, channel = frame.shape
-        bytes_per_line = 3 * width
-        qimg = QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-        self.pixmap = QPixmap.fromImage(qimg)
-        self.pixmap =  self.pixmap.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
-        self.pixmap_update()
+    def update_frame(self, frame, captured: float = 0.0):
+        timer = stage_timer(self.cam_id)
+        with span("paint", captured, device=self.cam_id):
+            height, width, channel = frame.shape
+            bytes_per_line = 3 * width
+            qimg = QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
+            self.pixmap = QPixmap.fromImage(qimg)
+            self.pixmap =  self.pixmap.scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+            timer.lap("qt_convert")
+            self.pixmap_update()
+            timer.lap("qt_set_pixmap")
+        self.frames_displayed += 1
+        timer.since("capture_to_display", captured)
 
     def pixmap_update(self,a:str = ""):
         if self.pixmap:
@@ -179,8 +191,12 @@ class MainWindow(QMainWindow):
     expanded_camera_id = None
     request_editor = pyqtSignal(str)
     request_camera_settings = pyqtSignal(str)
+    expanded_camera_changed = pyqtSignal(str)  # camera_id, "" when collapsed
+    trace_requested = pyqtSignal()
+    first_painted = pyqtSignal()  # один раз, после первой отрисовки окна
     def __init__(self):
         super().__init__()
+        self.painted = False
         self.camera_widgets: dict[str,CameraWidget] = {}  # Store widgets by camera_id
         self.camera_counter = 0
         self.current_grid_dimensions = (0, 0)  # (rows, cols)
@@ -232,11 +248,19 @@ class MainWindow(QMainWindow):
 
 
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.first_painted.emit()
+
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
             if self.isFullScreen():
                 self.exit.emit()
                 self.close()
+        elif event.key() == Qt.Key.Key_F12:
+            self.trace_requested.emit()
 
     def toggle_chosen_camera(self, camera_id):
         self.expanded_camera_id=camera_id if not  self.expanded_camera_id else None
@@ -245,6 +269,7 @@ class MainWindow(QMainWindow):
             self.camera_widgets[camera_id].setStyleSheet(CAMERA_WIDGET_EXPANDED_STYLE)
         else:
             self.camera_widgets[camera_id].setStyleSheet(CAMERA_WIDGET_DEFAULT_STYLE)
+        self.expanded_camera_changed.emit(self.expanded_camera_id or "")
         #self.camera_widgets[camera_id].pixmap_update("TOGGLE")
 
     def add_camera_widget(self, camera_id,camera_name):
@@ -319,10 +344,10 @@ class MainWindow(QMainWindow):
         self.camera_counter -= 1
         self.update_grid_layout()
 
-    def update_camera_frame(self, camera_id: str, frame):
+    def update_camera_frame(self, camera_id: str, frame, captured: float = 0.0):
         widget = self.camera_widgets.get(camera_id)
         if widget:
-            widget.update_frame(frame)
+            widget.update_frame(frame, captured)
 
     def calculate_grid_size(self,num_cameras):
         if num_cameras<=0: